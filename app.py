@@ -1,5 +1,6 @@
 import os
-from flask import Flask, render_template, redirect, url_for, flash, request, session, jsonify
+import click
+from flask import Flask, render_template, redirect, url_for, flash, request, session, jsonify, abort, send_from_directory
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -15,15 +16,45 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key')
 # ایمپورت کلاس دیتابیس و Auth
 from database import db
 from auth import AdminUser, login_manager
+from events import format_activity
+from assets import init_assets, build_assets
+from load_shedding import init_load_shedding, query_budget
+from benchmarks import benchmark_rows
+from reports import REPORTS, REPORT_COLUMNS, init_reports, refresh_reports, get_report, get_refreshed_at
+from reminders import init_reminders, enqueue_overdue_reminders, run_reminder_workers, load_sender
+import profiling
 
 # مقداردهی اولیه LoginManager
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 login_manager.login_message = 'لطفاً برای دسترسی به این صفحه وارد سیستم شوید.'
 
+# فایل‌های استاتیک hashدار و فشرده (flask build-assets)
+init_assets(app)
+
+# پاسخ 503 برای اضافه‌بار pool و پایان بودجه زمانی پرس‌وجوها
+init_load_shedding(app)
+
+# profile درخواست‌ها با هدر X-Profile / پارامتر ?profile=1 یا نمونه‌برداری 1 از N
+profiling.init_profiling(app, skip_endpoints=('profiles', 'profile_detail', 'profile_download'))
+
 # ایجاد جداول دیتابیس در ابتدای اجرا
 with app.app_context():
     db.init_db()
+    for shard in db.shards():
+        # گزارش‌های تجمیعی فقط روی PostgreSQL ساخته می‌شوند
+        if shard.backend == 'postgres':
+            init_reports(shard)
+            init_reminders(shard)
+
+def current_branch_id():
+    """شعبه انتخاب‌شده در session یا شعبه پیش‌فرض"""
+    branch_id = session.get('branch_id')
+    return branch_id if branch_id in db.branches else db.default_branch
+
+def branch_db():
+    """دسترسی به داده‌های شعبه جاری (فقط shard همان شعبه)"""
+    return db.for_branch(current_branch_id())
 
 # Context processor برای افزودن متغیرهای عمومی به تمام templateها
 @app.context_processor
@@ -31,6 +62,11 @@ def inject_now():
     """اضافه کردن تاریخ فعلی به تمام templateها"""
     return {'now': datetime.now(), 'current_date': datetime.now()}
 
+@app.context_processor
+def inject_branches():
+    """اضافه کردن لیست شعبه‌ها و شعبه جاری به تمام templateها"""
+    return {'branches': sorted(db.branches), 'current_branch_id': current_branch_id()}
+
 # صفحات اصلی
 @app.route('/')
 def home():
@@ -81,35 +117,31 @@ def logout():
     flash('با موفقیت از سیستم خارج شدید.', 'info')
     return redirect(url_for('login'))
 
+@app.route('/branch/<int:branch_id>')
+@login_required
+def switch_branch(branch_id):
+    if branch_id in db.branches:
+        session['branch_id'] = branch_id
+        flash(f'شعبه {branch_id} انتخاب شد.', 'info')
+    else:
+        flash('شعبه یافت نشد.', 'danger')
+    return redirect(url_for('dashboard'))
+
 @app.route('/dashboard')
 @login_required
+@query_budget(3000)
 def dashboard():
     stats = db.get_stats()
-    # ایجاد لیست فعالیت‌های اخیر (مثال)
-    recent_activities = [
-        {
-            'title': 'کتاب جدید اضافه شد',
-            'time': '5 دقیقه پیش',
-            'description': 'کتاب "تاریخ ایران" توسط مدیر اضافه شد'
-        },
-        {
-            'title': 'امانت کتاب',
-            'time': '1 ساعت پیش',
-            'description': 'کتاب "شاهنامه" به علی محمدی امانت داده شد'
-        },
-        {
-            'title': 'عضویت جدید',
-            'time': '2 ساعت پیش',
-            'description': 'عضو جدید "مریم احمدی" ثبت نام کرد'
-        }
-    ]
+    now = datetime.now()
+    recent_activities = [format_activity(event, now) for event in branch_db().get_recent_events(10)]
     return render_template('dashboard.html', stats=stats, recent_activities=recent_activities)
 
 # مدیریت کتاب‌ها
 @app.route('/books')
 @login_required
+@query_budget(5000)
 def books():
-    books_list = db.get_all_books()
+    books_list = branch_db().get_all_books()
     return render_template('books.html', books=books_list)
 
 @app.route('/books/add', methods=['GET', 'POST'])
@@ -135,7 +167,7 @@ def add_book():
             publication_year = int(publication_year) if publication_year else None
             total_copies = int(total_copies) if total_copies else 1
             
-            book_id = db.add_book(title, author, isbn, publication_year, total_copies)
+            book_id = branch_db().add_book(title, author, isbn, publication_year, total_copies)
             flash(f'کتاب "{title}" با موفقیت اضافه شد. کد کتاب: {book_id}', 'success')
             return redirect(url_for('books'))
         except Exception as e:
@@ -147,24 +179,40 @@ def add_book():
 @login_required
 def delete_book(book_id):
     try:
-        book = db.get_book_by_id(book_id)
+        book = branch_db().get_book_by_id(book_id)
         if not book:
             flash('کتاب یافت نشد.', 'danger')
-        elif book[6] != book[5]:  # اگر available_copies != total_copies
+        elif branch_db().has_open_borrowings(book_id):
             flash('این کتاب در حال حاضر امانت است و قابل حذف نیست.', 'danger')
         else:
-            db.delete_book(book_id)
-            flash(f'کتاب "{book[1]}" با موفقیت حذف شد.', 'success')
+            branch_db().delete_book(book_id)
+            flash(f'کتاب "{book.title}" با موفقیت حذف شد.', 'success')
     except Exception as e:
         flash(f'خطا در حذف کتاب: {str(e)}', 'danger')
     
     return redirect(url_for('books'))
 
+@app.route('/books/<int:book_id>/history')
+@login_required
+@query_budget(2000)
+def book_history(book_id):
+    book = branch_db().get_book_by_id(book_id)
+    if not book:
+        flash('کتاب یافت نشد.', 'danger')
+        return redirect(url_for('books'))
+    
+    history, next_cursor = branch_db().get_book_history(book_id, before=_decode_cursor(request.args.get('before')))
+    return render_template('loan_history.html',
+                          title=f'تاریخچه امانت کتاب "{book.title}"',
+                          history=history,
+                          next_cursor=_encode_cursor(next_cursor))
+
 # مدیریت اعضا
 @app.route('/members')
 @login_required
+@query_budget(5000)
 def members():
-    members_list = db.get_all_members()
+    members_list = branch_db().get_all_members()
     return render_template('members.html', members=members_list)
 
 @app.route('/members/add', methods=['GET', 'POST'])
@@ -182,7 +230,7 @@ def add_member():
             return render_template('add_member.html')
         
         try:
-            member_id = db.add_member(full_name, phone, email, address)
+            member_id = branch_db().add_member(full_name, phone, email, address)
             flash(f'عضو "{full_name}" با موفقیت اضافه شد. کد عضویت: {member_id}', 'success')
             return redirect(url_for('members'))
         except Exception as e:
@@ -195,33 +243,63 @@ def add_member():
 def deactivate_member(member_id):
     try:
         # بررسی اینکه عضو کتاب امانت داده دارد یا نه
-        borrowed = db.get_borrowed_books()
+        borrowed = branch_db().get_borrowed_books()
         has_active_borrowings = False
         member_name = None
         
-        for book in borrowed:
-            if book[4] == member_id:  # member_id
+        for loan in borrowed:
+            if loan.member_id == member_id:
                 has_active_borrowings = True
-                member_name = book[5]  # full_name
+                member_name = loan.full_name
                 break
         
         if has_active_borrowings:
             flash(f'عضو "{member_name}" کتاب‌های امانت داده دارد و قابل غیرفعال کردن نیست.', 'danger')
         else:
             # دریافت نام عضو قبل از غیرفعال کردن
-            members = db.get_all_members()
-            for member in members:
-                if member[0] == member_id:
-                    member_name = member[1]
-                    break
+            member = branch_db().get_member_by_id(member_id)
+            if member:
+                member_name = member.full_name
             
-            db.deactivate_member(member_id)
+            branch_db().deactivate_member(member_id)
             flash(f'عضو "{member_name}" با موفقیت غیرفعال شد.', 'success')
     except Exception as e:
         flash(f'خطا در غیرفعال کردن عضو: {str(e)}', 'danger')
     
     return redirect(url_for('members'))
 
+@app.route('/members/<int:member_id>/history')
+@login_required
+@query_budget(2000)
+def member_history(member_id):
+    member = branch_db().get_member_by_id(member_id)
+    if not member:
+        flash('عضو یافت نشد.', 'danger')
+        return redirect(url_for('members'))
+    
+    history, next_cursor = branch_db().get_member_history(member_id, before=_decode_cursor(request.args.get('before')))
+    return render_template('loan_history.html',
+                          title=f'تاریخچه امانت‌های "{member.full_name}"',
+                          history=history,
+                          next_cursor=_encode_cursor(next_cursor))
+
+def _encode_cursor(cursor):
+    """تبدیل کلید صفحه‌بندی (borrow_date, id) به رشته برای URL"""
+    if not cursor:
+        return None
+    borrow_date, borrowing_id = cursor
+    return f"{borrow_date.isoformat()}_{borrowing_id}"
+
+def _decode_cursor(value):
+    """بازگرداندن کلید صفحه‌بندی از پارامتر URL؛ مقدار نامعتبر یعنی صفحه اول"""
+    if not value:
+        return None
+    try:
+        borrow_date, borrowing_id = value.rsplit('_', 1)
+        return datetime.fromisoformat(borrow_date), int(borrowing_id)
+    except ValueError:
+        return None
+
 # مدیریت امانت کتاب
 @app.route('/borrow', methods=['GET', 'POST'])
 @login_required
@@ -244,7 +322,7 @@ def borrow_book():
             if days < 1:
                 days = 14
             
-            due_date = db.borrow_book(book_id, member_id, days)
+            due_date = branch_db().borrow_book(book_id, member_id, days)
             flash(f'کتاب با موفقیت امانت داده شد. موعد بازگشت: {due_date.strftime("%Y-%m-%d")}', 'success')
             return redirect(url_for('borrowed_books'))
         except ValueError as e:
@@ -253,8 +331,8 @@ def borrow_book():
             flash(f'خطا در امانت دادن کتاب: {str(e)}', 'danger')
     
     # دریافت لیست‌ها برای فرم
-    available_books = db.get_available_books()
-    active_members = db.get_active_members()
+    available_books = branch_db().get_available_books()
+    active_members = branch_db().get_active_members()
     
     return render_template('borrow_book.html', 
                           available_books=available_books, 
@@ -272,8 +350,11 @@ def return_book():
         
         try:
             book_id = int(book_id)
-            db.return_book(book_id)
-            flash('کتاب با موفقیت بازگردانده شد.', 'success')
+            hold = branch_db().return_book(book_id)
+            if hold:
+                flash(f'کتاب بازگردانده شد و برای رزرو عضو با کد {hold[1]} کنار گذاشته شد.', 'success')
+            else:
+                flash('کتاب با موفقیت بازگردانده شد.', 'success')
             return redirect(url_for('borrowed_books'))
         except ValueError as e:
             flash(str(e), 'danger')
@@ -281,19 +362,59 @@ def return_book():
             flash(f'خطا در بازگرداندن کتاب: {str(e)}', 'danger')
     
     # دریافت کتاب‌های امانت داده شده
-    borrowed_books = db.get_borrowed_books()
+    borrowed_books = branch_db().get_borrowed_books()
     book_choices = []
-    for book in borrowed_books:
-        if len(book) > 1:  # بررسی طول tuple
-            book_choices.append((book[1], f"{book[2]} (نویسنده: {book[3]}) - کد: {book[1]}"))
+    for loan in borrowed_books:
+        book_choices.append((loan.book_id, f"{loan.title} (نویسنده: {loan.author}) - کد: {loan.book_id}"))
     
     return render_template('return_book.html', book_choices=book_choices, borrowed_books=borrowed_books)
 
+# رزرو کتاب
+@app.route('/holds', methods=['GET', 'POST'])
+@login_required
+def holds():
+    if request.method == 'POST':
+        book_id = request.form.get('book_id')
+        member_id = request.form.get('member_id')
+        
+        if not book_id or not member_id:
+            flash('لطفاً کتاب و عضو را انتخاب کنید.', 'danger')
+            return redirect(url_for('holds'))
+        
+        try:
+            hold_id = branch_db().place_hold(int(book_id), int(member_id))
+            flash(f'رزرو با موفقیت ثبت شد. کد رزرو: {hold_id}', 'success')
+            return redirect(url_for('holds'))
+        except ValueError as e:
+            flash(str(e), 'danger')
+        except Exception as e:
+            flash(f'خطا در ثبت رزرو: {str(e)}', 'danger')
+    
+    return render_template('holds.html',
+                          holds=branch_db().get_active_holds(),
+                          unavailable_books=branch_db().get_unavailable_books(),
+                          active_members=branch_db().get_active_members())
+
+@app.route('/holds/<int:hold_id>/cancel')
+@login_required
+def cancel_hold(hold_id):
+    try:
+        branch_db().cancel_hold(hold_id)
+        flash('رزرو لغو شد.', 'success')
+    except ValueError as e:
+        flash(str(e), 'danger')
+    except Exception as e:
+        flash(f'خطا در لغو رزرو: {str(e)}', 'danger')
+    
+    return redirect(url_for('holds'))
+
 # جستجو
 @app.route('/search', methods=['GET', 'POST'])
 @login_required
+@query_budget(2000)
 def search_books():
     results = []
+    all_branches = request.form.get('all_branches') == '1'
     
     if request.method == 'POST':
         search_type = request.form.get('search_type')
@@ -304,17 +425,20 @@ def search_books():
         elif len(keyword) < 2:
             flash('کلیدواژه باید حداقل ۲ حرف باشد.', 'danger')
         else:
-            results = db.search_books(search_type, keyword)
+            # جستجو فقط در shard شعبه جاری؛ جستجوی سراسری فقط با انتخاب صریح کاربر
+            storage = db if all_branches else branch_db()
+            results = storage.search_books(search_type, keyword)
             if not results:
                 flash('نتیجه‌ای یافت نشد.', 'info')
     
-    return render_template('search_books.html', results=results)
+    return render_template('search_books.html', results=results, all_branches=all_branches)
 
 # وضعیت کتاب‌های امانت‌رفته
 @app.route('/borrowed')
 @login_required
+@query_budget(5000)
 def borrowed_books():
-    borrowed_list = db.get_borrowed_books()
+    borrowed_list = branch_db().get_borrowed_books()
     return render_template('borrowed_books.html', borrowed_list=borrowed_list)
 
 # تغییر رمز عبور
@@ -338,54 +462,23 @@ def change_password():
             flash('رمز عبور جدید باید حداقل ۶ حرف باشد.', 'danger')
             return render_template('change_password.html')
         
-        # بررسی رمز عبور فعلی
-        conn = db.get_connection()
         try:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT password_hash 
-                FROM admins 
-                WHERE id = %s
-            """, (current_user.id,))
-            
-            result = cur.fetchone()
-            if not result:
-                flash('کاربر یافت نشد.', 'danger')
-                return render_template('change_password.html')
-            
-            current_hash = result[0]
-            cur.close()
-            
-            if not db.verify_password(current_hash, current_password):
+            if not db.change_admin_password(current_user.id, current_password, new_password):
                 flash('رمز عبور فعلی اشتباه است.', 'danger')
                 return render_template('change_password.html')
             
-            # به‌روزرسانی رمز عبور
-            new_hash = db._hash_password(new_password)
-            cur = conn.cursor()
-            cur.execute("""
-                UPDATE admins 
-                SET password_hash = %s 
-                WHERE id = %s
-            """, (new_hash, current_user.id))
-            
-            conn.commit()
-            cur.close()
-            
             flash('رمز عبور با موفقیت تغییر کرد.', 'success')
             return redirect(url_for('dashboard'))
             
         except Exception as e:
             flash(f'خطا در تغییر رمز عبور: {str(e)}', 'danger')
-            conn.rollback()
-        finally:
-            conn.close()
     
     return render_template('change_password.html')
 
 # API برای آمار
 @app.route('/api/stats')
 @login_required
+@query_budget(3000)
 def get_stats():
     stats = db.get_stats()
     return jsonify({
@@ -395,6 +488,69 @@ def get_stats():
         'overdue_books': stats['overdue_books']
     })
 
+# آمار cache جستجو در همین پردازه برای تعیین اندازه آن
+@app.route('/api/cache/stats')
+@login_required
+def search_cache_stats():
+    return jsonify({
+        str(branch_id): branch.search_cache.stats()
+        for branch_id, branch in db.branches.items()
+        if getattr(branch, 'search_cache', None) is not None
+    })
+
+# گزارش‌ها (فقط از جداول تجمیعی خوانده می‌شوند)
+@app.route('/reports')
+@login_required
+@query_budget(2000)
+def reports():
+    if branch_db().backend != 'postgres':
+        flash('گزارش‌ها فقط با پایگاه داده PostgreSQL در دسترس هستند.', 'warning')
+        return redirect(url_for('dashboard'))
+    report_data = {name: (title, get_report(branch_db(), name, 10)) for name, (title, query) in REPORTS.items()}
+    return render_template('reports.html', reports=report_data, refreshed_at=get_refreshed_at(branch_db()))
+
+@app.route('/api/reports/<name>')
+@login_required
+@query_budget(2000)
+def api_report(name):
+    if name not in REPORTS:
+        return jsonify({'error': 'گزارش یافت نشد'}), 404
+    if branch_db().backend != 'postgres':
+        return jsonify({'error': 'گزارش‌ها فقط با PostgreSQL در دسترس هستند'}), 501
+    limit = min(request.args.get('limit', 20, type=int), 500)
+    columns = REPORT_COLUMNS[name]
+    rows = get_report(branch_db(), name, limit)
+    return jsonify({
+        'report': name,
+        'title': REPORTS[name][0],
+        'rows': [dict(zip(columns, row)) for row in rows]
+    })
+
+# profileهای ذخیره‌شده درخواست‌ها
+@app.route('/profiling')
+@login_required
+def profiles():
+    routes, recent = profiling.list_profiles()
+    return render_template('profiling.html', routes=routes, recent=recent,
+                           sample_rate=profiling.SAMPLE_RATE)
+
+@app.route('/profiling/<route>/<name>')
+@login_required
+def profile_detail(route, name):
+    result = profiling.load_profile(route, name)
+    if result is None:
+        abort(404)
+    summary, stacks, functions = result
+    return render_template('profiling_detail.html', profile=summary, stacks=stacks, functions=functions)
+
+@app.route('/profiling/<route>/<name>/folded')
+@login_required
+def profile_download(route, name):
+    if not profiling.valid_name(route) or not profiling.valid_name(name):
+        abort(404)
+    directory = os.path.join(os.path.abspath(profiling.PROFILE_DIR), route)
+    return send_from_directory(directory, name + '.folded', mimetype='text/plain', as_attachment=True)
+
 # صفحه پروفایل کاربر
 @app.route('/profile')
 @login_required
@@ -419,6 +575,87 @@ def page_404():
 def page_500():
     return render_template('500.html'), 500
 
+# دستورات خط فرمان (flask <command>)
+def postgres_shards():
+    """shardهای PostgreSQL برای دستورات نگهداری؛ backend درون‌حافظه‌ای این دستورات را ندارد"""
+    shards = [shard for shard in db.shards() if shard.backend == 'postgres']
+    if not shards:
+        raise click.UsageError('این دستور فقط با پایگاه داده PostgreSQL در دسترس است.')
+    return shards
+
+@app.cli.command('archive-borrowings')
+@click.option('--days', type=int, default=lambda: int(os.environ.get('ARCHIVE_AFTER_DAYS', 30)),
+              help='امانت‌هایی که بیش از این تعداد روز از بازگشتشان گذشته آرشیو می‌شوند.')
+@click.option('--batch-size', default=5000, help='تعداد ردیف‌ها در هر دسته.')
+def archive_borrowings_command(days, batch_size):
+    """انتقال امانت‌های برگشت‌خورده قدیمی به جدول آرشیو"""
+    archived = sum(shard.archive_returned_borrowings(days, batch_size) for shard in postgres_shards())
+    click.echo(f"{archived} borrowings archived")
+
+@app.cli.command('measure-planning')
+@click.option('--iterations', default=20, help='تعداد اجرای هر پرس‌وجو.')
+def measure_planning_command(iterations):
+    """مقایسه زمان planning پرس‌وجوهای پرتکرار با و بدون prepared statement"""
+    if db.backend != 'postgres':
+        raise click.UsageError('این دستور فقط با پایگاه داده PostgreSQL در دسترس است.')
+    results = db.measure_planning_overhead(iterations)
+    click.echo(f"{'statement':<28}{'plain ms':>12}{'prepared ms':>14}{'saved ms':>12}")
+    for name, (plain, prepared) in results.items():
+        click.echo(f"{name:<28}{plain:>12.3f}{prepared:>14.3f}{plain - prepared:>12.3f}")
+
+@app.cli.command('refresh-reports')
+@click.option('--full', is_flag=True, help='بازسازی کامل جداول تجمیعی.')
+def refresh_reports_command(full):
+    """به‌روزرسانی افزایشی جداول گزارش از امانت‌های جدید"""
+    processed = sum(refresh_reports(shard, full=full) for shard in postgres_shards())
+    click.echo(f"{processed} borrowings added to reports")
+
+@app.cli.command('enqueue-reminders')
+@click.option('--chunk-size', default=500, help='تعداد امانت‌ها در هر دسته درج.')
+@click.option('--interval-days', default=3, help='حداقل فاصله دو یادآوری برای یک امانت.')
+def enqueue_reminders_command(chunk_size, interval_days):
+    """افزودن امانت‌های معوقه به صف یادآوری"""
+    enqueued = sum(enqueue_overdue_reminders(shard, chunk_size, interval_days) for shard in postgres_shards())
+    click.echo(f"{enqueued} reminders enqueued")
+
+@app.cli.command('run-reminder-worker')
+@click.option('--workers', default=4, help='تعداد workerهای موازی.')
+@click.option('--batch-size', default=100, help='تعداد یادآوری‌ها در هر دسته ارسال.')
+@click.option('--poll-interval', default=30, help='فاصله بررسی صف خالی بر حسب ثانیه.')
+@click.option('--once', is_flag=True, help='خروج پس از خالی شدن صف.')
+def run_reminder_worker_command(workers, batch_size, poll_interval, once):
+    """ارسال یادآوری‌های صف با ارسال‌کننده REMINDER_SENDER"""
+    sent, failed = run_reminder_workers(postgres_shards(), load_sender(), workers=workers,
+                                        batch_size=batch_size, poll_interval=poll_interval,
+                                        once=once)
+    click.echo(f"{sent} reminders sent, {failed} failed")
+
+@app.cli.command('reconcile-inventory')
+@click.option('--dry-run', is_flag=True, help='فقط گزارش اختلاف‌ها بدون اصلاح.')
+@click.option('--batch-size', default=1000, help='تعداد کتاب‌ها در هر دسته.')
+def reconcile_inventory_command(dry_run, batch_size):
+    """بازمحاسبه موجودی کتاب‌ها از روی امانت‌های فعال و اصلاح اختلاف‌ها"""
+    drift = [row for shard in postgres_shards()
+             for row in shard.reconcile_inventory(batch_size=batch_size, repair=not dry_run)]
+    for book_id, title, available, expected in drift:
+        click.echo(f"book {book_id} ({title}): available_copies {available} -> {expected}")
+    action = 'found' if dry_run else 'repaired'
+    click.echo(f"{len(drift)} books with drift {action}")
+
+@app.cli.command('benchmark-rows')
+@click.option('--rows', default=100000, help='تعداد ردیف‌های ساختگی.')
+def benchmark_rows_command(rows):
+    """مقایسه حافظه هر ردیف و زمان رندر برای tuple، dict و مدل‌های ردیف"""
+    for name, (bytes_per_row, render_ms) in benchmark_rows(app.jinja_env, rows).items():
+        click.echo(f"{name}: {bytes_per_row:.0f} bytes/row, render {render_ms:.1f} ms")
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """کوچک‌سازی و ساخت نسخه‌های hashدار و فشرده فایل‌های استاتیک"""
+    manifest = build_assets(app.static_folder)
+    for source, target in manifest.items():
+        click.echo(f"{source} -> {target}")
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,139 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:  # brotli اختیاری است؛ بدون آن فقط نسخه gzip ساخته می‌شود
+    brotli = None
+
+# فایل‌های استاتیک سفارشی که در مرحله build پردازش می‌شوند
+ASSET_SOURCES = ('css/style.css', 'js/script.js')
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+
+_manifest = None
+_static_folder = None
+
+
+def minify_css(text):
+    """حذف توضیحات و فاصله‌های اضافی CSS"""
+    text = re.sub(r'/\*.*?\*/', '', text, flags=re.S)
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'\s*([{};,>])\s*', r'\1', text)
+    text = re.sub(r':\s+', ':', text)
+    return text.replace(';}', '}').strip()
+
+
+def minify_js(text):
+    """کوچک‌سازی محافظه‌کارانه JavaScript: حذف توضیحات تک‌خطی کامل، تورفتگی و خطوط خالی
+
+    خطوط داخل template literalهای چندخطی دست‌نخورده می‌مانند.
+    """
+    lines = []
+    in_template = False
+    for line in text.splitlines():
+        if in_template:
+            lines.append(line)
+        else:
+            stripped = line.strip()
+            if stripped and not stripped.startswith('//'):
+                lines.append(stripped)
+        if line.count('`') % 2:
+            in_template = not in_template
+    return '\n'.join(lines)
+
+
+MINIFIERS = {'.css': minify_css, '.js': minify_js}
+
+
+def build_assets(static_folder):
+    """کوچک‌سازی، نام‌گذاری با hash محتوا و ساخت نسخه‌های gzip/brotli
+
+    خروجی در static/dist نوشته می‌شود و manifest.json نام اصلی هر فایل را
+    به نام hashدار آن نگاشت می‌کند.
+    خروجی تابع: همان دیکشنری manifest
+    """
+    manifest = {}
+    for source in ASSET_SOURCES:
+        base, ext = os.path.splitext(source)
+        with open(os.path.join(static_folder, source), encoding='utf-8') as f:
+            content = MINIFIERS[ext](f.read()).encode('utf-8')
+
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        target = f"{DIST_DIR}/{base}.{digest}{ext}"
+        path = os.path.join(static_folder, target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with open(path, 'wb') as f:
+            f.write(content)
+        # mtime=0 تا خروجی gzip برای محتوای یکسان همیشه یکسان باشد
+        with open(path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(path + '.br', 'wb') as f:
+                f.write(brotli.compress(content, quality=11))
+
+        manifest[source] = target
+
+    with open(os.path.join(static_folder, DIST_DIR, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_manifest(static_folder):
+    """خواندن manifest ساخته‌شده؛ در نبود آن فایل‌های اصلی استفاده می‌شوند"""
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def asset_url(filename):
+    """مشابه url_for('static', filename=...) اما با نام hashدار فایل در صورت وجود build
+
+    اگر STATIC_URL تنظیم شده باشد (مثلاً CDN یا nginx) آدرس با آن پیشوند ساخته می‌شود.
+    """
+    filename = _manifest.get(filename, filename) if _manifest else filename
+    static_url = os.environ.get('STATIC_URL')
+    if static_url:
+        return f"{static_url.rstrip('/')}/{filename}"
+    return url_for('static', filename=filename)
+
+
+def send_dist_file(filename):
+    """ارسال فایل hashدار با cache دائمی و نسخه فشرده متناسب با Accept-Encoding"""
+    directory = os.path.join(_static_folder, DIST_DIR)
+    accept = request.headers.get('Accept-Encoding', '')
+    mimetype = mimetypes.guess_type(filename)[0]
+
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if encoding in accept and os.path.isfile(os.path.join(directory, filename + suffix)):
+            response = send_from_directory(directory, filename + suffix, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    else:
+        response = send_from_directory(directory, filename, mimetype=mimetype)
+
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def init_assets(app):
+    """ثبت asset_url در templateها و مسیر سرو فایل‌های build شده"""
+    global _manifest, _static_folder
+    _static_folder = app.static_folder
+    _manifest = load_manifest(app.static_folder)
+    app.add_template_global(asset_url)
+    app.add_url_rule(f"{app.static_url_path}/{DIST_DIR}/<path:filename>",
+                     'dist_static', send_dist_file)
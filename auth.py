@@ -1,4 +1,5 @@
 from flask_login import LoginManager, UserMixin
+from psycopg2.pool import PoolError
 from database import db
 
 class AdminUser(UserMixin):
@@ -12,50 +13,29 @@ class AdminUser(UserMixin):
     @staticmethod
     def get(user_id):
         """دریافت کاربر از پایگاه داده بر اساس ID"""
-        conn = db.get_connection()
         try:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT id, username 
-                FROM admins 
-                WHERE id = %s
-            """, (user_id,))
-            
-            user_data = cur.fetchone()
-            cur.close()
-            
+            user_data = db.get_admin_by_id(user_id)
             if user_data:
-                return AdminUser(user_data[0], user_data[1])
+                return AdminUser(user_data.id, user_data.username)
             return None
+        except PoolError:
+            # اضافه‌بار نباید کاربر را از سیستم خارج کند؛ پاسخ 503 داده می‌شود
+            raise
         except Exception as e:
             print(f"Error loading user: {e}")
             return None
-        finally:
-            conn.close()
     
     @staticmethod
     def authenticate(username, password):
         """احراز هویت کاربر"""
-        conn = db.get_connection()
         try:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT id, username, password_hash 
-                FROM admins 
-                WHERE username = %s
-            """, (username,))
-            
-            admin_data = cur.fetchone()
-            cur.close()
-            
-            if admin_data and db.verify_password(admin_data[2], password):
-                return AdminUser(admin_data[0], admin_data[1])
+            admin_data = db.authenticate_admin(username, password)
+            if admin_data:
+                return AdminUser(admin_data.id, admin_data.username)
             return None
         except Exception as e:
             print(f"Error authenticating user: {e}")
             return None
-        finally:
-            conn.close()
 
 # ایجاد مدیریت لاگین
 login_manager = LoginManager()
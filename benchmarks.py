@@ -0,0 +1,65 @@
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from models import Loan
+
+# ستون‌های امانت به ترتیب get_borrowed_books
+LOAN_COLUMNS = ('id', 'book_id', 'title', 'author', 'member_id', 'full_name',
+                'borrow_date', 'due_date')
+
+# یک ردیف جدول امانت‌ها با دسترسی به ستون‌ها بر اساس شماره یا نام
+ROW_TEMPLATES = {
+    'index': "{% for r in rows %}<tr><td>{{ r[2] }}</td><td>{{ r[5] }}</td>"
+             "<td>{{ r[7] }}</td></tr>{% endfor %}",
+    'name': "{% for r in rows %}<tr><td>{{ r.title }}</td><td>{{ r.full_name }}</td>"
+            "<td>{{ r.due_date }}</td></tr>{% endfor %}",
+    'lazy': "{% for r in rows %}<tr><td>{{ r.title }}</td><td>{{ r.full_name }}</td>"
+            "<td>{{ r.due_on }}</td></tr>{% endfor %}",
+}
+
+
+def _sample_rows(count):
+    """ردیف‌های ساختگی امانت با رشته‌های جدا برای هر ردیف (مانند خروجی psycopg2)"""
+    now = datetime.now()
+    for i in range(count):
+        yield (i, i % 5000, f'کتاب {i}', f'نویسنده {i % 700}', i % 9000,
+               f'عضو {i % 9000}', now - timedelta(days=i % 60), now + timedelta(days=14 - i % 30))
+
+
+def _measure(build):
+    """حافظه مصرفی ساخت ردیف‌ها؛ خروجی: (ردیف‌ها، بایت)"""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        rows = build()
+        used = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    return rows, used
+
+
+def benchmark_rows(jinja_env, count=100000):
+    """مقایسه حافظه هر ردیف و زمان رندر لیست برای tuple، dict و مدل Loan
+
+    حافظه رشته‌ها و تاریخ‌ها در هر سه حالت یکسان است، پس اختلاف فقط از
+    ساختار ردیف می‌آید.
+    خروجی: {نام: (بایت به ازای هر ردیف، میلی‌ثانیه رندر)}
+    """
+    raw = list(_sample_rows(count))
+    builders = {
+        'tuple': (lambda: [(*row,) for row in raw], 'index'),
+        'dict': (lambda: [dict(zip(LOAN_COLUMNS, row)) for row in raw], 'name'),
+        'Loan': (lambda: [Loan._make(row + (None, False)) for row in raw], 'name'),
+        'Loan (lazy dates)': (lambda: [Loan._make(row + (None, False)) for row in raw], 'lazy'),
+    }
+
+    results = {}
+    for name, (build, template_name) in builders.items():
+        rows, used = _measure(build)
+        template = jinja_env.from_string(ROW_TEMPLATES[template_name])
+        started = time.perf_counter()
+        template.render(rows=rows)
+        elapsed = (time.perf_counter() - started) * 1000
+        results[name] = (used / count, elapsed)
+    return results
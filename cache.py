@@ -0,0 +1,115 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_keyword(keyword):
+    """یکسان‌سازی کلیدواژه جستجو؛ ILIKE به بزرگی و کوچکی حروف حساس نیست"""
+    return keyword.strip().lower()
+
+
+class LRUCache:
+    """cache محدود به تعداد و عمر ورودی‌ها با آمار hit/miss
+
+    ورودی‌ها به ترتیب آخرین استفاده نگه داشته می‌شوند و با پر شدن ظرفیت
+    قدیمی‌ترین آن‌ها حذف می‌شود. هر ورودی می‌تواند چند برچسب (مثلاً id
+    کتاب‌های داخل نتیجه) داشته باشد تا با invalidate_tag فقط ورودی‌های
+    مرتبط حذف شوند. هر invalidate شماره generation را افزایش می‌دهد؛ put با
+    generation قدیمی نادیده گرفته می‌شود تا نتیجه‌ای که پیش از یک تغییر
+    خوانده شده پس از آن در cache ننشیند.
+    """
+
+    def __init__(self, max_size=256, ttl=60):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """مقدار ذخیره‌شده یا None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value, tags = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value, tags=(), generation=None):
+        """ذخیره مقدار؛ اگر generation از زمان خواندن تغییر کرده باشد ذخیره نمی‌شود"""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if key in self._entries:
+                self._remove(key)
+            tags = frozenset(tags)
+            self._entries[key] = (time.monotonic() + self.ttl, value, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        expires_at, value, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate_tag(self, tag):
+        """حذف ورودی‌هایی که برچسب tag دارند"""
+        with self._lock:
+            self.generation += 1
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate(self, predicate):
+        """حذف ورودی‌هایی که predicate(key) برای آن‌ها درست است"""
+        with self._lock:
+            self.generation += 1
+            for key in [key for key in self._entries if predicate(key)]:
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self):
+        """آمار cache برای تعیین اندازه مناسب"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
@@ -0,0 +1,125 @@
+import json
+import os
+import select
+import threading
+import time
+
+import psycopg2
+from psycopg2 import Error
+
+# کانال LISTEN/NOTIFY تغییرات کتاب‌ها برای باطل کردن cache جستجوی همه پردازه‌ها
+CHANNEL = 'search_cache'
+# فاصله تلاش دوباره برای اتصال listener پس از قطع شدن (ثانیه)
+RECONNECT_DELAY = 5
+# اگر در این مدت پیامی نرسد با یک پرس‌وجو زنده بودن اتصال بررسی می‌شود (ثانیه)
+KEEPALIVE_INTERVAL = 30
+
+
+def notify_search_change(cur, branch_id, book_id=None, title=None, author=None):
+    """اعلام تغییر یک کتاب (یا افزودن کتاب جدید) در تراکنش جاری
+
+    پستگرس NOTIFY را فقط پس از commit تحویل می‌دهد، پس پردازه‌های دیگر
+    تغییری را که rollback شده نمی‌بینند.
+    """
+    if book_id is not None:
+        payload = {'branch': branch_id, 'book': book_id}
+    else:
+        payload = {'branch': branch_id, 'title': title, 'author': author}
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, json.dumps(payload, ensure_ascii=False)))
+
+
+def notify_books_changed(cur, book_ids):
+    """اعلام تغییر چند کتاب از شعبه‌های مختلف در تراکنش جاری"""
+    cur.execute("""
+        SELECT pg_notify(%s, json_build_object('branch', branch_id, 'book', id)::text)
+        FROM books WHERE id = ANY(%s)
+    """, (CHANNEL, list(book_ids)))
+
+
+class SearchCacheListener:
+    """دریافت اعلان‌های تغییر کتاب و باطل کردن cache جستجوی شعبه‌های این پردازه
+
+    هر پردازه برای هر shard یک اتصال جداگانه (خارج از pool) با LISTEN دارد.
+    اعلان‌هایی که در زمان قطع بودن اتصال فرستاده شده‌اند از دست می‌روند؛
+    برای همین تا وقتی listener وصل نیست cache استفاده نمی‌شود و پس از هر
+    اتصال دوباره همه cacheها پاک می‌شوند.
+    """
+
+    def __init__(self, db_url):
+        self.db_url = db_url
+        self.connected = False
+        self._databases = {}
+        self._lock = threading.Lock()
+
+    def register(self, database):
+        """ثبت شعبه‌ای که cache جستجوی آن باید با اعلان‌ها باطل شود"""
+        with self._lock:
+            self._databases.setdefault(database.branch_id, []).append(database)
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _all(self):
+        with self._lock:
+            return [database for databases in self._databases.values() for database in databases]
+
+    def _dispatch(self, payload):
+        try:
+            change = json.loads(payload)
+        except ValueError as e:
+            print(f"Error parsing search cache notification: {e}")
+            return
+        with self._lock:
+            databases = list(self._databases.get(change.get('branch'), ()))
+        for database in databases:
+            database.invalidate_search(change.get('book'), change.get('title'), change.get('author'))
+
+    def _listen(self):
+        conn = psycopg2.connect(self.db_url)
+        try:
+            conn.autocommit = True
+            cur = conn.cursor()
+            cur.execute(f"LISTEN {CHANNEL}")
+            # تغییرات پیش از LISTEN دیده نشده‌اند
+            for database in self._all():
+                database.search_cache.clear()
+            self.connected = True
+
+            while True:
+                readable, _, _ = select.select([conn], [], [], KEEPALIVE_INTERVAL)
+                if not readable:
+                    cur.execute("SELECT 1")
+                conn.poll()
+                while conn.notifies:
+                    self._dispatch(conn.notifies.pop(0).payload)
+        finally:
+            self.connected = False
+            conn.close()
+
+    def _run(self):
+        while True:
+            try:
+                self._listen()
+            except (Error, OSError) as e:
+                print(f"Error in search cache listener: {e}")
+            # ورودی‌هایی که در زمان قطع بودن ذخیره شده‌اند دیگر قابل اعتماد نیستند
+            for database in self._all():
+                database.search_cache.clear()
+            time.sleep(RECONNECT_DELAY)
+
+
+_listeners = {}
+_listeners_lock = threading.Lock()
+
+
+def get_listener(database):
+    """listener shard پایگاه داده در پردازه جاری؛ در اولین استفاده (پس از fork) ساخته می‌شود"""
+    entry = _listeners.get(database.db_url)
+    if entry is None or entry[0] != os.getpid():
+        with _listeners_lock:
+            entry = _listeners.get(database.db_url)
+            if entry is None or entry[0] != os.getpid():
+                entry = (os.getpid(), SearchCacheListener(database.db_url))
+                _listeners[database.db_url] = entry
+                entry[1].start()
+    return entry[1]
@@ -1,24 +1,520 @@
 import os
-import psycopg2
-from psycopg2 import Error, sql
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from psycopg2 import Error, sql, extensions, pool
 from datetime import datetime, timedelta  # این خط اضافه شد
-import hashlib
-import binascii
+from events import RecentEvents
+from cache import LRUCache, normalize_keyword
+from cache_sync import get_listener, notify_books_changed, notify_search_change
+from storage import LibraryStorage
+from models import Book, Member, Loan, Hold, Admin
+from memory_storage import MemoryStorage
 
-class Database:
-    def __init__(self):
-        self.db_url = os.environ.get('DATABASE_URL')
+# پرس‌وجوهای پرتکرار؛ روی هر اتصال یک بار PREPARE و سپس با EXECUTE اجرا می‌شوند
+PREPARED_STATEMENTS = {
+    'book_by_id': """
+        SELECT id, title, author, isbn, publication_year, 
+               total_copies, available_copies
+        FROM books 
+        WHERE id = $1 AND branch_id = $2
+    """,
+    'book_for_borrow': """
+        SELECT available_copies, title FROM books WHERE id = $1 AND branch_id = $2
+    """,
+    'member_name': """
+        SELECT full_name FROM members WHERE id = $1 AND branch_id = $2
+    """,
+    'insert_borrowing': """
+        INSERT INTO borrowings (book_id, member_id, due_date, branch_id)
+        VALUES ($1, $2, $3, $4)
+    """,
+    'decrement_available': """
+        UPDATE books 
+        SET available_copies = available_copies - 1 
+        WHERE id = $1
+    """,
+    'open_borrowing_for_book': """
+        SELECT borrowings.id, books.title, members.full_name
+        FROM borrowings
+        JOIN books ON borrowings.book_id = books.id
+        JOIN members ON borrowings.member_id = members.id
+        WHERE borrowings.book_id = $1 AND borrowings.is_returned = FALSE
+          AND borrowings.branch_id = $2
+        ORDER BY borrowings.borrow_date DESC LIMIT 1
+    """,
+    'mark_returned': """
+        UPDATE borrowings 
+        SET is_returned = TRUE, return_date = CURRENT_TIMESTAMP 
+        WHERE id = $1
+    """,
+    'increment_available': """
+        UPDATE books 
+        SET available_copies = available_copies + 1 
+        WHERE id = $1
+    """,
+    'search_books_title': """
+        SELECT id, title, author, available_copies, branch_id
+        FROM books 
+        WHERE title ILIKE $1 AND branch_id = $2
+        ORDER BY title
+    """,
+    'search_books_author': """
+        SELECT id, title, author, available_copies, branch_id
+        FROM books 
+        WHERE author ILIKE $1 AND branch_id = $2
+        ORDER BY title
+    """,
+    'fulfil_ready_hold': """
+        UPDATE holds 
+        SET status = 'fulfilled' 
+        WHERE book_id = $1 AND member_id = $2 AND status = 'ready'
+        RETURNING id
+    """,
+    'pop_hold_queue': """
+        UPDATE holds 
+        SET status = 'ready', ready_at = CURRENT_TIMESTAMP 
+        WHERE id = (
+            SELECT id FROM holds
+            WHERE book_id = $1 AND status = 'waiting'
+            ORDER BY created_at
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, member_id
+    """,
+    'insert_event': """
+        INSERT INTO events (event_type, description, branch_id)
+        VALUES ($1, $2, $3)
+        RETURNING id, event_type, description, created_at
+    """,
+    'count_books': "SELECT COUNT(*) FROM books WHERE branch_id = $1",
+    'count_active_members': """
+        SELECT COUNT(*) FROM members WHERE is_active = TRUE AND branch_id = $1
+    """,
+    'count_open_borrowings': """
+        SELECT COUNT(*) FROM borrowings WHERE is_returned = FALSE AND branch_id = $1
+    """,
+    'count_overdue': """
+        SELECT COUNT(*) FROM borrowings 
+        WHERE is_returned = FALSE AND due_date < CURRENT_DATE AND branch_id = $1
+    """,
+    'overdue_list': """
+        SELECT 
+            books.title,
+            members.full_name,
+            borrowings.due_date
+        FROM borrowings
+        JOIN books ON borrowings.book_id = books.id
+        JOIN members ON borrowings.member_id = members.id
+        WHERE borrowings.is_returned = FALSE AND borrowings.due_date < CURRENT_DATE
+          AND borrowings.branch_id = $1
+        ORDER BY borrowings.due_date
+        LIMIT 5
+    """,
+}
+
+# همان پرس‌وجوها با placeholderهای psycopg2 برای حالت بدون prepared statement
+PLAIN_STATEMENTS = {name: re.sub(r'\$\d+', '%s', query)
+                    for name, query in PREPARED_STATEMENTS.items()}
+
+
+def _escape_like(text):
+    """escape نویسه‌های ویژه الگوی LIKE"""
+    return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class LibraryConnection(extensions.connection):
+    """اتصال psycopg2 که نام prepared statementهای ساخته‌شده روی خود را نگه می‌دارد"""
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+        # مقدار فعلی statement_timeout جلسه (میلی‌ثانیه)؛ None یعنی هنوز تنظیم نشده
+        self.statement_timeout = None
+        # همه cursorها ModelCursor هستند تا زمان پرس‌وجوها قابل اندازه‌گیری باشد
+        self.cursor_factory = ModelCursor
+
+
+class ModelCursor(extensions.cursor):
+    """cursor که هر ردیف را بر اساس نام ستون‌ها به مدل row_model تبدیل می‌کند
+    
+    تطبیق ستون‌ها با فیلدهای مدل فقط یک بار برای هر نتیجه انجام می‌شود. اگر
+    ستون‌ها همان فیلدهای ابتدایی مدل باشند، ردیف بدون بازچینی با _make ساخته
+    می‌شود. بدون row_model ردیف‌ها همان tuple معمولی هستند.
+    
+    اگر درخواست جاری در حال profile شدن باشد (track_sql_time)، مدت هر
+    execute در لیست زمان‌های SQL همان درخواست ثبت می‌شود.
+    """
+    row_model = None
+    _converter_key = None
+    _converter = None
+    
+    def execute(self, query, vars=None):
+        timings = getattr(_request_state, 'sql_timings', None)
+        if timings is None:
+            return super().execute(query, vars)
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            timings.append(time.perf_counter() - started)
+    
+    def _row_converter(self):
+        names = tuple(column.name for column in self.description)
+        # row_model یک cursor ممکن است بین پرس‌وجوها عوض شود (get_stats)
+        key = (self.row_model, names)
+        if key != self._converter_key:
+            model = self.row_model
+            fields = model._fields
+            defaults = model._field_defaults
+            if names == fields[:len(names)]:
+                padding = tuple(defaults[field] for field in fields[len(names):])
+                make = model._make
+                self._converter = lambda row: make(row + padding)
+            else:
+                positions = {name: i for i, name in enumerate(names)}
+                plan = [(positions.get(field), defaults.get(field)) for field in fields]
+                make = model._make
+                self._converter = lambda row: make([row[i] if i is not None else default
+                                                    for i, default in plan])
+            self._converter_key = key
+        return self._converter
+    
+    def fetchone(self):
+        row = super().fetchone()
+        if row is None or self.row_model is None:
+            return row
+        return self._row_converter()(row)
+    
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        if self.row_model is None or not rows:
+            return rows
+        return list(map(self._row_converter(), rows))
+    
+    def fetchall(self):
+        rows = super().fetchall()
+        if self.row_model is None or not rows:
+            return rows
+        return list(map(self._row_converter(), rows))
+    
+    def __iter__(self):
+        rows = super().__iter__()
+        if self.row_model is None:
+            return rows
+        return (self._row_converter()(row) for row in rows)
+
+
+class PoolSaturated(pool.PoolError):
+    """صف انتظار pool پر است؛ درخواست بدون انتظار رد می‌شود"""
+
+
+class BlockingConnectionPool(pool.ThreadedConnectionPool):
+    """pool اتصالی که وقتی همه اتصال‌ها در حال استفاده‌اند منتظر می‌ماند
+    
+    ThreadedConnectionPool در این حالت بلافاصله PoolError می‌دهد. در حالت
+    gevent (بعد از monkey patch) semaphore فقط green thread منتظر را متوقف
+    می‌کند، پس صدها درخواست هم‌زمان می‌توانند چند اتصال محدود را به نوبت بگیرند.
+    اگر تعداد منتظرها به max_waiting برسد، درخواست‌های بعدی فوراً با
+    PoolSaturated رد می‌شوند تا اضافه‌بار به جای صف طولانی به خطای سریع تبدیل شود.
+    """
+    def __init__(self, minconn, maxconn, *args, timeout=30, max_waiting=None, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self.timeout = timeout
+        self.max_waiting = max_waiting
+        self.waiting = 0
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._waiting_lock = threading.Lock()
+    
+    def getconn(self, key=None):
+        if not self._slots.acquire(blocking=False):
+            with self._waiting_lock:
+                if self.max_waiting is not None and self.waiting >= self.max_waiting:
+                    raise PoolSaturated("connection pool queue is full")
+                self.waiting += 1
+            try:
+                acquired = self._slots.acquire(timeout=self.timeout)
+            finally:
+                with self._waiting_lock:
+                    self.waiting -= 1
+            if not acquired:
+                raise pool.PoolError("connection pool exhausted (timeout)")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+    
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+    
+    def _putconn(self, conn, key=None, close=False):
+        """برگرداندن اتصال به pool بدون بستن آن
+        
+        AbstractConnectionPool فقط minconn اتصال بیکار نگه می‌دارد و بقیه را
+        می‌بندد؛ در این صورت هر درخواست اتصال تازه باز می‌کرد و prepared
+        statementها و statement_timeout جلسه از دست می‌رفتند. اینجا همه
+        اتصال‌ها (تا maxconn) برای درخواست‌های بعدی باز می‌مانند.
+        """
+        if self.closed:
+            raise pool.PoolError("connection pool is closed")
+        if key is None:
+            key = self._rused.get(id(conn))
+            if key is None:
+                raise pool.PoolError("trying to put unkeyed connection")
+        
+        if not close and not conn.closed and len(self._pool) < self.maxconn:
+            status = conn.info.transaction_status
+            if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+                # اتصال قطع شده است
+                conn.close()
+            else:
+                if status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                self._pool.append(conn)
+        elif not conn.closed:
+            conn.close()
+        
+        del self._used[key]
+        del self._rused[id(conn)]
+
+
+class PooledConnection:
+    """پوشش اتصال گرفته‌شده از pool؛ close() اتصال را به pool برمی‌گرداند"""
+    def __init__(self, connection_pool, conn, active=None):
+        self._pool = connection_pool
+        self._conn = conn
+        self._lock = threading.Lock()
+        # لیست اتصال‌های فعال درخواست جاری برای لغو پرس‌وجو پس از قطع اتصال کاربر
+        self._active = active
+        if active is not None:
+            active.append(self)
+    
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+    
+    def cancel(self):
+        """لغو پرس‌وجوی در حال اجرا فقط تا وقتی اتصال در اختیار همین درخواست است
+        
+        پس از close() اتصال ممکن است به درخواست دیگری داده شده باشد و لغو آن
+        پرس‌وجوی درخواست دیگر را از بین می‌برد.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.cancel()
+    
+    def close(self):
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            if self._active is not None:
+                self._active.remove(self)
+            self._pool.putconn(conn)
+
+
+# محدودیت زمانی و اتصال‌های فعال درخواست جاری؛ در حالت gevent برای هر greenlet جداست
+_request_state = threading.local()
+
+
+def set_request_budget(timeout_ms, active=None):
+    """تنظیم statement_timeout اتصال‌هایی که درخواست جاری می‌گیرد
+    
+    active: لیستی که اتصال‌های در حال استفاده در آن ثبت می‌شوند تا بتوان
+    پرس‌وجوهای آن‌ها را با cancel() لغو کرد.
+    """
+    _request_state.timeout_ms = timeout_ms
+    _request_state.active = active
+
+
+def clear_request_budget():
+    """بازگشت به statement_timeout پیش‌فرض پس از پایان درخواست"""
+    _request_state.timeout_ms = None
+    _request_state.active = None
+
+
+def track_sql_time(timings):
+    """ثبت مدت اجرای پرس‌وجوهای درخواست جاری در لیست timings؛ None برای توقف"""
+    _request_state.sql_timings = timings
+
+
+# تعداد پیش‌فرض درخواست‌های منتظر به ازای هر اتصال pool
+POOL_WAITING_PER_CONNECTION = 4
+
+# poolهای اتصال به ازای هر آدرس پایگاه داده: db_url -> (pid, pool)
+# شعبه‌هایی که روی یک shard هستند pool مشترک دارند
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class Database(LibraryStorage):
+    """دسترسی به داده‌های یک شعبه روی shard مربوط به آن (PostgreSQL)"""
+    backend = 'postgres'
+    
+    def __init__(self, db_url=None, branch_id=None):
+        self.db_url = db_url or os.environ.get('DATABASE_URL')
         if not self.db_url:
             raise ValueError("DATABASE_URL environment variable is not set")
+        self.branch_id = branch_id or int(os.environ.get('DEFAULT_BRANCH_ID', 1))
+        self.pool_min = int(os.environ.get('DB_POOL_MIN', 1))
+        self.pool_max = int(os.environ.get('DB_POOL_MAX', 10))
+        self.pool_timeout = float(os.environ.get('DB_POOL_TIMEOUT', 30))
+        # صف انتظار pool؛ پیش‌فرض چند برابر اندازه pool تا هر منتظر در چند نوبت اتصال بگیرد
+        self.pool_max_waiting = int(os.environ.get('DB_POOL_MAX_WAITING',
+                                                   self.pool_max * POOL_WAITING_PER_CONNECTION))
+        # statement_timeout پیش‌فرض (میلی‌ثانیه) برای اتصال‌های خارج از routeهای دارای بودجه؛ 0 یعنی بدون محدودیت
+        self.statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT', 0))
+        self.use_prepared = os.environ.get('DB_PREPARED_STATEMENTS', '1') != '0'
+        self.recent_events = RecentEvents(
+            size=int(os.environ.get('RECENT_EVENTS_SIZE', 50)),
+            max_age=int(os.environ.get('RECENT_EVENTS_MAX_AGE', 30))
+        )
+        # نتایج جستجو در هر پردازه؛ SEARCH_CACHE_SIZE=0 آن را غیرفعال می‌کند
+        self.search_cache = LRUCache(
+            max_size=int(os.environ.get('SEARCH_CACHE_SIZE', 256)),
+            ttl=float(os.environ.get('SEARCH_CACHE_TTL', 60))
+        )
+        self._search_listener = None
+    
+    def _get_pool(self):
+        """ساخت pool اتصال به صورت تنبل و جداگانه برای هر پردازه (پس از fork)"""
+        entry = _pools.get(self.db_url)
+        if entry is None or entry[0] != os.getpid():
+            with _pools_lock:
+                entry = _pools.get(self.db_url)
+                if entry is None or entry[0] != os.getpid():
+                    entry = (os.getpid(), BlockingConnectionPool(
+                        self.pool_min, self.pool_max, self.db_url,
+                        timeout=self.pool_timeout,
+                        max_waiting=self.pool_max_waiting,
+                        connection_factory=LibraryConnection
+                    ))
+                    _pools[self.db_url] = entry
+        return entry[1]
     
     def get_connection(self):
-        """ایجاد اتصال به پایگاه داده"""
+        """گرفتن اتصال از pool پایگاه داده با statement_timeout درخواست جاری"""
         try:
-            conn = psycopg2.connect(self.db_url)
-            return conn
+            connection_pool = self._get_pool()
+            conn = connection_pool.getconn()
+        except pool.PoolError:
+            # رد شدن به دلیل اضافه‌بار خطای اتصال نیست و لاگ نمی‌شود
+            raise
         except Error as e:
             print(f"Error connecting to database: {e}")
             raise
+        
+        timeout_ms = getattr(_request_state, 'timeout_ms', None)
+        if timeout_ms is None:
+            timeout_ms = self.statement_timeout
+        try:
+            self._set_statement_timeout(conn, timeout_ms)
+        except Error:
+            connection_pool.putconn(conn, close=True)
+            raise
+        return PooledConnection(connection_pool, conn, getattr(_request_state, 'active', None))
+    
+    def _set_statement_timeout(self, conn, timeout_ms):
+        """تنظیم statement_timeout جلسه فقط وقتی با مقدار فعلی اتصال فرق دارد"""
+        if conn.statement_timeout == timeout_ms:
+            return
+        cur = conn.cursor()
+        cur.execute("SET statement_timeout = %s", (timeout_ms,))
+        cur.close()
+        # commit تا SET با rollback بعدی تراکنش برنگردد
+        conn.commit()
+        conn.statement_timeout = timeout_ms
+    
+    def _cursor(self, conn, row_model):
+        """cursorی که ردیف‌ها را به صورت مدل row_model برمی‌گرداند"""
+        cur = conn.cursor(cursor_factory=ModelCursor)
+        cur.row_model = row_model
+        return cur
+    
+    def _execute(self, cur, name, params=()):
+        """اجرای پرس‌وجوی ثبت‌شده در PREPARED_STATEMENTS
+        
+        روی هر اتصال، پرس‌وجو در اولین استفاده PREPARE می‌شود و از آن پس
+        فقط EXECUTE ارسال می‌شود تا Postgres دوباره parse و plan نکند.
+        """
+        if not self.use_prepared:
+            cur.execute(PLAIN_STATEMENTS[name], params or None)
+            return
+        
+        conn = cur.connection
+        if name not in conn.prepared:
+            cur.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+            conn.prepared.add(name)
+        if params:
+            placeholders = ', '.join(['%s'] * len(params))
+            cur.execute(f"EXECUTE {name} ({placeholders})", params)
+        else:
+            cur.execute(f"EXECUTE {name}")
+    
+    def measure_planning_overhead(self, iterations=20):
+        """مقایسه میانگین زمان planning پرس‌وجوهای ثبت‌شده با و بدون prepared statement
+        
+        همه اجراها داخل یک تراکنش انجام و در پایان rollback می‌شوند.
+        خروجی: {name: (plain_ms, prepared_ms)}
+        """
+        conn = self.get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT COALESCE(MIN(id), 0) FROM books")
+            book_id = cur.fetchone()[0]
+            cur.execute("SELECT COALESCE(MIN(id), 0) FROM members")
+            member_id = cur.fetchone()[0]
+            cur.execute("SELECT COALESCE(MIN(id), 0) FROM borrowings")
+            borrowing_id = cur.fetchone()[0]
+            
+            samples = {
+                'book_by_id': (book_id, self.branch_id),
+                'book_for_borrow': (book_id, self.branch_id),
+                'member_name': (member_id, self.branch_id),
+                'insert_borrowing': (book_id, member_id, datetime.now(), self.branch_id),
+                'decrement_available': (book_id,),
+                'open_borrowing_for_book': (book_id, self.branch_id),
+                'mark_returned': (borrowing_id,),
+                'increment_available': (book_id,),
+                'fulfil_ready_hold': (book_id, member_id),
+                'pop_hold_queue': (book_id,),
+                'search_books_title': ('%a%', self.branch_id),
+                'search_books_author': ('%a%', self.branch_id),
+                'insert_event': ('benchmark', 'benchmark', self.branch_id),
+            }
+            
+            def planning_time(query, params):
+                cur.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {query}", params or None)
+                return cur.fetchone()[0][0]['Planning Time']
+            
+            results = {}
+            for name in PREPARED_STATEMENTS:
+                params = samples.get(name, (self.branch_id,))
+                cur.execute("SAVEPOINT measure")
+                try:
+                    if name not in conn.prepared:
+                        cur.execute(f"PREPARE {name} AS {PREPARED_STATEMENTS[name]}")
+                        conn.prepared.add(name)
+                    execute = f"EXECUTE {name}"
+                    if params:
+                        execute += f" ({', '.join(['%s'] * len(params))})"
+                    plain = sum(planning_time(PLAIN_STATEMENTS[name], params)
+                                for _ in range(iterations)) / iterations
+                    prepared = sum(planning_time(execute, params)
+                                   for _ in range(iterations)) / iterations
+                    results[name] = (plain, prepared)
+                    cur.execute("RELEASE SAVEPOINT measure")
+                except Error as e:
+                    print(f"Error measuring {name}: {e}")
+                    cur.execute("ROLLBACK TO SAVEPOINT measure")
+            cur.close()
+            return results
+        finally:
+            conn.rollback()
+            conn.close()
     
     def init_db(self):
         """ایجاد جداول در صورت عدم وجود"""
@@ -76,6 +572,119 @@ class Database:
                 )
             """)
             
+            # آرشیو امانت‌های برگشت‌خورده (داده‌های سرد)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS borrowings_archive (
+                    id INTEGER PRIMARY KEY,
+                    book_id INTEGER REFERENCES books(id) ON DELETE CASCADE,
+                    member_id INTEGER REFERENCES members(id) ON DELETE CASCADE,
+                    borrow_date TIMESTAMP NOT NULL,
+                    due_date TIMESTAMP NOT NULL,
+                    return_date TIMESTAMP,
+                    is_returned BOOLEAN DEFAULT TRUE,
+                    archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            
+            # شعبه مالک هر ردیف
+            for table in ('books', 'members', 'borrowings', 'borrowings_archive'):
+                cur.execute(sql.SQL("""
+                    ALTER TABLE {} ADD COLUMN IF NOT EXISTS branch_id INTEGER NOT NULL DEFAULT 1
+                """).format(sql.Identifier(table)))
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_books_branch_title
+                ON books (branch_id, title)
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_members_branch_name
+                ON members (branch_id, full_name)
+                WHERE is_active = TRUE
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_borrowings_open_branch
+                ON borrowings (branch_id, due_date)
+                WHERE is_returned = FALSE
+            """)
+            
+            # ایندکس‌های جزئی روی امانت‌های فعال (داده‌های گرم)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_borrowings_open_book
+                ON borrowings (book_id, borrow_date DESC)
+                WHERE is_returned = FALSE
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_borrowings_open_due
+                ON borrowings (due_date)
+                WHERE is_returned = FALSE
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_borrowings_returned
+                ON borrowings (return_date)
+                WHERE is_returned = TRUE
+            """)
+            
+            # ایندکس‌های ترکیبی برای تاریخچه امانت هر عضو و هر کتاب
+            for table in ('borrowings', 'borrowings_archive'):
+                cur.execute(sql.SQL("""
+                    CREATE INDEX IF NOT EXISTS {} ON {} (member_id, borrow_date DESC, id DESC)
+                """).format(sql.Identifier(f'idx_{table}_member_history'), sql.Identifier(table)))
+                cur.execute(sql.SQL("""
+                    CREATE INDEX IF NOT EXISTS {} ON {} (book_id, borrow_date DESC, id DESC)
+                """).format(sql.Identifier(f'idx_{table}_book_history'), sql.Identifier(table)))
+            
+            # جدول رویدادها (فقط افزودنی)
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS events (
+                    id BIGSERIAL PRIMARY KEY,
+                    event_type VARCHAR(40) NOT NULL,
+                    description TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # رویدادهای هر شعبه جدا خوانده می‌شوند (شعبه‌های یک shard جدول مشترک دارند)
+            cur.execute("""
+                ALTER TABLE events ADD COLUMN IF NOT EXISTS branch_id INTEGER NOT NULL DEFAULT 1
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_events_branch
+                ON events (branch_id, id DESC)
+            """)
+            
+            # صف رزرو کتاب‌ها (FIFO برای هر کتاب)
+            # وضعیت‌ها: waiting (در صف)، ready (نسخه کنار گذاشته شده)، fulfilled، cancelled
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS holds (
+                    id SERIAL PRIMARY KEY,
+                    book_id INTEGER REFERENCES books(id) ON DELETE CASCADE,
+                    member_id INTEGER REFERENCES members(id) ON DELETE CASCADE,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    status VARCHAR(20) DEFAULT 'waiting',
+                    ready_at TIMESTAMP
+                )
+            """)
+            cur.execute("""
+                CREATE INDEX IF NOT EXISTS idx_holds_queue
+                ON holds (book_id, created_at)
+                WHERE status = 'waiting'
+            """)
+            cur.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_holds_active_member
+                ON holds (book_id, member_id)
+                WHERE status IN ('waiting', 'ready')
+            """)
+            
+            # نمای تاریخچه کامل (امانت‌های جاری + آرشیو)
+            cur.execute("""
+                CREATE OR REPLACE VIEW borrowing_history AS
+                SELECT id, book_id, member_id, borrow_date, due_date,
+                       return_date, is_returned, branch_id
+                FROM borrowings
+                UNION ALL
+                SELECT id, book_id, member_id, borrow_date, due_date,
+                       return_date, is_returned, branch_id
+                FROM borrowings_archive
+            """)
+            
             conn.commit()
             print("Database tables created successfully")
             
@@ -121,56 +730,55 @@ class Database:
         finally:
             conn.close()
     
-    def _hash_password(self, password):
-        """هش کردن رمز عبور"""
-        salt = hashlib.sha256(os.urandom(60)).hexdigest().encode('ascii')
-        pwdhash = hashlib.pbkdf2_hmac('sha512', password.encode('utf-8'), 
-                                     salt, 100000)
-        pwdhash = binascii.hexlify(pwdhash)
-        return (salt + pwdhash).decode('ascii')
-    
-    def verify_password(self, stored_password, provided_password):
-        """بررسی رمز عبور"""
-        salt = stored_password[:64]
-        stored_password = stored_password[64:]
-        pwdhash = hashlib.pbkdf2_hmac('sha512', 
-                                      provided_password.encode('utf-8'), 
-                                      salt.encode('ascii'), 
-                                      100000)
-        pwdhash = binascii.hexlify(pwdhash).decode('ascii')
-        return pwdhash == stored_password
-    
     # متدهای کاربردی برای اعضا
     def get_all_members(self):
         """دریافت همه اعضا"""
         conn = self.get_connection()
         try:
-            cur = conn.cursor()
+            cur = self._cursor(conn, Member)
             cur.execute("""
                 SELECT id, full_name, phone, email, address, join_date, is_active 
                 FROM members 
-                WHERE is_active = TRUE 
+                WHERE is_active = TRUE AND branch_id = %s
                 ORDER BY full_name
-            """)
+            """, (self.branch_id,))
             members = cur.fetchall()
             cur.close()
             return members
         finally:
             conn.close()
     
+    def get_member_by_id(self, member_id):
+        """دریافت عضو بر اساس ID"""
+        conn = self.get_connection()
+        try:
+            cur = self._cursor(conn, Member)
+            cur.execute("""
+                SELECT id, full_name, phone, email, address, join_date, is_active 
+                FROM members 
+                WHERE id = %s AND branch_id = %s
+            """, (member_id, self.branch_id))
+            member = cur.fetchone()
+            cur.close()
+            return member
+        finally:
+            conn.close()
+    
     def add_member(self, full_name, phone, email, address):
         """افزودن عضو جدید"""
         conn = self.get_connection()
         try:
             cur = conn.cursor()
             cur.execute("""
-                INSERT INTO members (full_name, phone, email, address)
-                VALUES (%s, %s, %s, %s)
+                INSERT INTO members (full_name, phone, email, address, branch_id)
+                VALUES (%s, %s, %s, %s, %s)
                 RETURNING id
-            """, (full_name, phone, email, address))
+            """, (full_name, phone, email, address, self.branch_id))
             member_id = cur.fetchone()[0]
+            event = self._log_event(cur, 'member_added', f'عضو جدید "{full_name}" ثبت نام کرد')
             conn.commit()
             cur.close()
+            self.recent_events.push(event)
             return member_id
         except Error as e:
             conn.rollback()
@@ -186,8 +794,8 @@ class Database:
             cur.execute("""
                 UPDATE members 
                 SET is_active = FALSE 
-                WHERE id = %s
-            """, (member_id,))
+                WHERE id = %s AND branch_id = %s
+            """, (member_id, self.branch_id))
             conn.commit()
             cur.close()
         finally:
@@ -198,13 +806,14 @@ class Database:
         """دریافت همه کتاب‌ها"""
         conn = self.get_connection()
         try:
-            cur = conn.cursor()
+            cur = self._cursor(conn, Book)
             cur.execute("""
                 SELECT id, title, author, isbn, publication_year, 
                        total_copies, available_copies, created_at
                 FROM books 
+                WHERE branch_id = %s
                 ORDER BY title
-            """)
+            """, (self.branch_id,))
             books = cur.fetchall()
             cur.close()
             return books
@@ -215,13 +824,8 @@ class Database:
         """دریافت کتاب بر اساس ID"""
         conn = self.get_connection()
         try:
-            cur = conn.cursor()
-            cur.execute("""
-                SELECT id, title, author, isbn, publication_year, 
-                       total_copies, available_copies
-                FROM books 
-                WHERE id = %s
-            """, (book_id,))
+            cur = self._cursor(conn, Book)
+            self._execute(cur, 'book_by_id', (book_id, self.branch_id))
             book = cur.fetchone()
             cur.close()
             return book
@@ -235,13 +839,17 @@ class Database:
             cur = conn.cursor()
             cur.execute("""
                 INSERT INTO books (title, author, isbn, publication_year, 
-                                 total_copies, available_copies)
-                VALUES (%s, %s, %s, %s, %s, %s)
+                                 total_copies, available_copies, branch_id)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
                 RETURNING id
-            """, (title, author, isbn, publication_year, total_copies, total_copies))
+            """, (title, author, isbn, publication_year, total_copies, total_copies, self.branch_id))
             book_id = cur.fetchone()[0]
+            event = self._log_event(cur, 'book_added', f'کتاب "{title}" اضافه شد')
+            notify_search_change(cur, self.branch_id, title=title, author=author)
             conn.commit()
             cur.close()
+            self.recent_events.push(event)
+            self.invalidate_search(title=title, author=author)
             return book_id
         except Error as e:
             conn.rollback()
@@ -254,40 +862,161 @@ class Database:
         conn = self.get_connection()
         try:
             cur = conn.cursor()
-            cur.execute("DELETE FROM books WHERE id = %s", (book_id,))
+            cur.execute("DELETE FROM books WHERE id = %s AND branch_id = %s", (book_id, self.branch_id))
+            notify_search_change(cur, self.branch_id, book_id)
             conn.commit()
             cur.close()
+            self.search_cache.invalidate_tag(book_id)
         finally:
             conn.close()
     
-    def search_books(self, search_type, keyword):
-        """جستجوی کتاب"""
+    def has_open_borrowings(self, book_id):
+        """بررسی وجود امانت فعال برای کتاب (بدون اتکا به available_copies)"""
+        conn = self.get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT EXISTS (
+                    SELECT 1 FROM borrowings 
+                    WHERE book_id = %s AND is_returned = FALSE AND branch_id = %s
+                )
+            """, (book_id, self.branch_id))
+            result = cur.fetchone()[0]
+            cur.close()
+            return result
+        finally:
+            conn.close()
+    
+    def reconcile_inventory(self, batch_size=1000, repair=True):
+        """بازمحاسبه available_copies از روی امانت‌های فعال و رزروهای آماده
+        
+        کاتالوگ به دسته‌هایی از idهای پشت سر هم تقسیم می‌شود. برای هر دسته
+        ردیف‌های books قفل می‌شوند (تا borrow/return هم‌زمان منتظر بمانند)،
+        موجودی مورد انتظار با یک پرس‌وجوی گروه‌بندی‌شده محاسبه و اختلاف‌ها
+        اصلاح می‌شوند و تراکنش همان دسته commit می‌شود تا قفل‌ها کوتاه بمانند.
+        خروجی: لیست (book_id, title, available_copies, expected)
+        """
+        drift = []
+        last_id = 0
         conn = self.get_connection()
         try:
             cur = conn.cursor()
-            search_pattern = f"%{keyword}%"
+            while True:
+                cur.execute(f"""
+                    SELECT id FROM books 
+                    WHERE id > %s 
+                    ORDER BY id 
+                    LIMIT %s
+                    {'FOR UPDATE' if repair else ''}
+                """, (last_id, batch_size))
+                ids = [row[0] for row in cur.fetchall()]
+                if not ids:
+                    break
+                first_id, last_id = ids[0], ids[-1]
+                
+                cur.execute("""
+                    SELECT books.id, books.title, books.available_copies,
+                           GREATEST(books.total_copies
+                                    - COALESCE(open_loans.count, 0)
+                                    - COALESCE(ready_holds.count, 0), 0) AS expected
+                    FROM books
+                    LEFT JOIN (
+                        SELECT book_id, COUNT(*) AS count FROM borrowings
+                        WHERE is_returned = FALSE AND book_id BETWEEN %s AND %s
+                        GROUP BY book_id
+                    ) open_loans ON open_loans.book_id = books.id
+                    LEFT JOIN (
+                        SELECT book_id, COUNT(*) AS count FROM holds
+                        WHERE status = 'ready' AND book_id BETWEEN %s AND %s
+                        GROUP BY book_id
+                    ) ready_holds ON ready_holds.book_id = books.id
+                    WHERE books.id BETWEEN %s AND %s
+                """, (first_id, last_id) * 3)
+                chunk_drift = [row for row in cur.fetchall() if row[2] != row[3]]
+                
+                if repair and chunk_drift:
+                    cur.execute("""
+                        UPDATE books 
+                        SET available_copies = fixed.expected
+                        FROM unnest(%s::int[], %s::int[]) AS fixed(id, expected)
+                        WHERE books.id = fixed.id
+                    """, ([row[0] for row in chunk_drift], [row[3] for row in chunk_drift]))
+                    notify_books_changed(cur, [row[0] for row in chunk_drift])
+                conn.commit()
+                drift.extend(chunk_drift)
+            cur.close()
+            return drift
+        except Error as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+    
+    def search_books(self, search_type, keyword):
+        """جستجوی کتاب
+        
+        نتایج با کلید (search_type, کلیدواژه یکسان‌شده) در search_cache ذخیره و
+        با id کتاب‌ها برچسب می‌خورند تا تغییر هر کتاب فقط جستجوهای شامل آن را
+        باطل کند.
+        """
+        search_type = 'title' if search_type == 'title' else 'author'
+        keyword = normalize_keyword(keyword)
+        key = (search_type, keyword)
+        use_cache = self._search_cache_ready()
+        if use_cache:
+            cached = self.search_cache.get(key)
+            if cached is not None:
+                return list(cached)
+        generation = self.search_cache.generation
+        
+        conn = self.get_connection()
+        try:
+            cur = self._cursor(conn, Book)
+            # % و _ در کلیدواژه به معنای خودشان جستجو می‌شوند (نویسه escape پیش‌فرض LIKE همان \ است)
+            search_pattern = f"%{_escape_like(keyword)}%"
             
             if search_type == 'title':
-                query = """
-                    SELECT id, title, author, available_copies
-                    FROM books 
-                    WHERE title ILIKE %s 
-                    ORDER BY title
-                """
+                query = 'search_books_title'
             else:  # author
-                query = """
-                    SELECT id, title, author, available_copies
-                    FROM books 
-                    WHERE author ILIKE %s 
-                    ORDER BY title
-                """
-            
-            cur.execute(query, (search_pattern,))
+                query = 'search_books_author'
+            
+            self._execute(cur, query, (search_pattern, self.branch_id))
             results = cur.fetchall()
             cur.close()
-            return results
         finally:
             conn.close()
+        
+        if use_cache:
+            self.search_cache.put(key, tuple(results), tags=[book.id for book in results],
+                                  generation=generation)
+        return results
+    
+    def _search_cache_ready(self):
+        """آیا cache جستجو قابل استفاده است
+        
+        cache هر پردازه با اعلان‌های LISTEN/NOTIFY تغییرات پردازه‌های دیگر
+        باطل می‌شود؛ تا وقتی listener این پردازه وصل نیست از cache استفاده نمی‌شود.
+        """
+        if self.search_cache.max_size <= 0:
+            return False
+        listener = get_listener(self)
+        if self._search_listener is not listener:
+            # پس از fork ورودی‌های به ارث رسیده از پردازه والد اعلانی دریافت نکرده‌اند
+            self.search_cache.clear()
+            listener.register(self)
+            self._search_listener = listener
+        return listener.connected
+    
+    def invalidate_search(self, book_id=None, title=None, author=None):
+        """باطل کردن جستجوهای شامل کتاب book_id، یا جستجوهایی که کتاب جدید
+        (title, author) باید در نتیجه آن‌ها باشد"""
+        if book_id is not None:
+            self.search_cache.invalidate_tag(book_id)
+            return
+        title, author = title.lower(), author.lower()
+        self.search_cache.invalidate(
+            lambda key: key[1] in (title if key[0] == 'title' else author)
+        )
     
     # متدهای کاربردی برای امانت کتاب
     def borrow_book(self, book_id, member_id, days):
@@ -297,33 +1026,42 @@ class Database:
             cur = conn.cursor()
             
             # بررسی موجودی کتاب
-            cur.execute("SELECT available_copies FROM books WHERE id = %s", (book_id,))
+            self._execute(cur, 'book_for_borrow', (book_id, self.branch_id))
             book_info = cur.fetchone()
             
             if not book_info:
                 raise ValueError("کتاب یافت نشد")
             
-            if book_info[0] < 1:
+            self._execute(cur, 'member_name', (member_id, self.branch_id))
+            member_info = cur.fetchone()
+            if not member_info:
+                raise ValueError("عضو یافت نشد")
+            
+            # اگر نسخه‌ای برای رزرو این عضو کنار گذاشته شده، همان تحویل داده می‌شود
+            self._execute(cur, 'fulfil_ready_hold', (book_id, member_id))
+            from_hold = cur.fetchone() is not None
+            
+            if not from_hold and book_info[0] < 1:
                 raise ValueError("کتاب موجود نیست")
             
             # محاسبه تاریخ سررسید
             due_date = datetime.now() + timedelta(days=days)
             
             # ثبت امانت
-            cur.execute("""
-                INSERT INTO borrowings (book_id, member_id, due_date)
-                VALUES (%s, %s, %s)
-            """, (book_id, member_id, due_date))
+            self._execute(cur, 'insert_borrowing', (book_id, member_id, due_date, self.branch_id))
             
-            # کاهش موجودی
-            cur.execute("""
-                UPDATE books 
-                SET available_copies = available_copies - 1 
-                WHERE id = %s
-            """, (book_id,))
+            # کاهش موجودی (نسخه رزروشده قبلاً از موجودی کسر شده است)
+            if not from_hold:
+                self._execute(cur, 'decrement_available', (book_id,))
             
+            event = self._log_event(cur, 'book_borrowed',
+                                    f'کتاب "{book_info[1]}" به {member_info[0]} امانت داده شد')
+            notify_search_change(cur, self.branch_id, book_id)
             conn.commit()
             cur.close()
+            self.recent_events.push(event)
+            # موجودی کتاب در نتایج جستجوی ذخیره‌شده تغییر کرده است
+            self.search_cache.invalidate_tag(book_id)
             return due_date
         except Error as e:
             conn.rollback()
@@ -332,17 +1070,16 @@ class Database:
             conn.close()
     
     def return_book(self, book_id):
-        """بازگرداندن کتاب"""
+        """بازگرداندن کتاب
+        
+        خروجی: (hold_id, member_id) رزروی که نسخه به آن تخصیص یافت، یا None
+        """
         conn = self.get_connection()
         try:
             cur = conn.cursor()
             
             # یافتن امانت فعال
-            cur.execute("""
-                SELECT id FROM borrowings 
-                WHERE book_id = %s AND is_returned = FALSE
-                ORDER BY borrow_date DESC LIMIT 1
-            """, (book_id,))
+            self._execute(cur, 'open_borrowing_for_book', (book_id, self.branch_id))
             
             borrowing = cur.fetchone()
             if not borrowing:
@@ -351,72 +1088,314 @@ class Database:
             borrowing_id = borrowing[0]
             
             # به‌روزرسانی وضعیت بازگشت
+            self._execute(cur, 'mark_returned', (borrowing_id,))
+            
+            # تخصیص نسخه به نفر اول صف رزرو یا افزایش موجودی
+            hold = self._allocate_copy(cur, book_id)
+            
+            event = self._log_event(cur, 'book_returned',
+                                    f'کتاب "{borrowing[1]}" توسط {borrowing[2]} بازگردانده شد')
+            notify_search_change(cur, self.branch_id, book_id)
+            conn.commit()
+            cur.close()
+            self.recent_events.push(event)
+            self.search_cache.invalidate_tag(book_id)
+            return hold
+        except Error as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+    
+    # متدهای کاربردی برای رزرو کتاب
+    def _allocate_copy(self, cur, book_id):
+        """تخصیص یک نسخه آزادشده به ابتدای صف رزرو
+        
+        نفر اول صف با ایندکس (book_id, created_at) برداشته می‌شود و نسخه
+        برای او کنار گذاشته می‌شود؛ اگر صف خالی باشد موجودی کتاب افزایش می‌یابد.
+        خروجی: (hold_id, member_id) یا None
+        """
+        self._execute(cur, 'pop_hold_queue', (book_id,))
+        hold = cur.fetchone()
+        if hold is None:
+            self._execute(cur, 'increment_available', (book_id,))
+        return hold
+    
+    def place_hold(self, book_id, member_id):
+        """ثبت رزرو کتاب برای عضو"""
+        conn = self.get_connection()
+        try:
+            cur = conn.cursor()
+            
+            self._execute(cur, 'book_for_borrow', (book_id, self.branch_id))
+            book_info = cur.fetchone()
+            if not book_info:
+                raise ValueError("کتاب یافت نشد")
+            
+            self._execute(cur, 'member_name', (member_id, self.branch_id))
+            if not cur.fetchone():
+                raise ValueError("عضو یافت نشد")
+            
+            if book_info[0] > 0:
+                raise ValueError("کتاب موجود است و می‌توان آن را مستقیماً امانت داد")
+            
             cur.execute("""
-                UPDATE borrowings 
-                SET is_returned = TRUE, return_date = CURRENT_TIMESTAMP 
-                WHERE id = %s
-            """, (borrowing_id,))
+                INSERT INTO holds (book_id, member_id)
+                VALUES (%s, %s)
+                ON CONFLICT (book_id, member_id) WHERE status IN ('waiting', 'ready') DO NOTHING
+                RETURNING id
+            """, (book_id, member_id))
+            hold = cur.fetchone()
+            if not hold:
+                raise ValueError("این عضو قبلاً این کتاب را رزرو کرده است")
+            
+            conn.commit()
+            cur.close()
+            return hold[0]
+        except Error as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+    
+    def cancel_hold(self, hold_id):
+        """لغو رزرو؛ نسخه کنار گذاشته‌شده به نفر بعدی صف می‌رسد"""
+        conn = self.get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT holds.book_id, holds.status FROM holds 
+                JOIN books ON holds.book_id = books.id
+                WHERE holds.id = %s AND books.branch_id = %s
+                FOR UPDATE OF holds
+            """, (hold_id, self.branch_id))
+            hold = cur.fetchone()
+            if not hold or hold[1] not in ('waiting', 'ready'):
+                raise ValueError("رزرو فعالی با این کد یافت نشد")
             
-            # افزایش موجودی
             cur.execute("""
-                UPDATE books 
-                SET available_copies = available_copies + 1 
+                UPDATE holds 
+                SET status = 'cancelled' 
                 WHERE id = %s
-            """, (book_id,))
+            """, (hold_id,))
+            
+            if hold[1] == 'ready':
+                self._allocate_copy(cur, hold[0])
+                notify_search_change(cur, self.branch_id, hold[0])
             
             conn.commit()
             cur.close()
+            if hold[1] == 'ready':
+                self.search_cache.invalidate_tag(hold[0])
         except Error as e:
             conn.rollback()
             raise e
         finally:
             conn.close()
     
+    def get_active_holds(self):
+        """دریافت لیست رزروهای در صف و آماده تحویل"""
+        conn = self.get_connection()
+        try:
+            cur = self._cursor(conn, Hold)
+            cur.execute("""
+                SELECT 
+                    holds.id,
+                    books.id as book_id,
+                    books.title,
+                    members.id as member_id,
+                    members.full_name,
+                    holds.created_at,
+                    holds.status,
+                    holds.ready_at
+                FROM holds
+                JOIN books ON holds.book_id = books.id
+                JOIN members ON holds.member_id = members.id
+                WHERE holds.status IN ('waiting', 'ready') AND books.branch_id = %s
+                ORDER BY books.title, holds.created_at
+            """, (self.branch_id,))
+            holds = cur.fetchall()
+            cur.close()
+            return holds
+        finally:
+            conn.close()
+    
+    def get_unavailable_books(self):
+        """دریافت لیست کتاب‌هایی که نسخه موجود ندارند (قابل رزرو)"""
+        conn = self.get_connection()
+        try:
+            cur = self._cursor(conn, Book)
+            cur.execute("""
+                SELECT id, title, author 
+                FROM books 
+                WHERE available_copies < 1 AND branch_id = %s
+                ORDER BY title
+            """, (self.branch_id,))
+            books = cur.fetchall()
+            cur.close()
+            return books
+        finally:
+            conn.close()
+    
     def get_borrowed_books(self):
         """دریافت لیست کتاب‌های امانت‌رفته"""
         conn = self.get_connection()
         try:
-            cur = conn.cursor()
+            # وضعیت معوقه در خود مدل Loan و فقط هنگام نمایش محاسبه می‌شود
+            cur = self._cursor(conn, Loan)
             cur.execute("""
                 SELECT 
-                    borrowings.id as borrowing_id,
+                    borrowings.id,
                     books.id as book_id,
                     books.title,
                     books.author,
                     members.id as member_id,
                     members.full_name,
                     borrowings.borrow_date,
-                    borrowings.due_date,
-                    CASE 
-                        WHEN borrowings.due_date < CURRENT_DATE THEN 'معوقه'
-                        ELSE 'در امانت'
-                    END as status
+                    borrowings.due_date
                 FROM borrowings
                 JOIN books ON borrowings.book_id = books.id
                 JOIN members ON borrowings.member_id = members.id
-                WHERE borrowings.is_returned = FALSE
+                WHERE borrowings.is_returned = FALSE AND borrowings.branch_id = %s
                 ORDER BY borrowings.due_date
-            """)
+            """, (self.branch_id,))
             borrowed = cur.fetchall()
             cur.close()
             return borrowed
+        except extensions.QueryCanceledError:
+            # پایان بودجه زمانی نباید به صورت لیست خالی نمایش داده شود
+            raise
         except Error as e:
             print(f"Error in get_borrowed_books: {e}")
             return []
         finally:
             conn.close()
     
-    def get_available_books(self):
-        """دریافت لیست کتاب‌های موجود"""
+    def archive_returned_borrowings(self, older_than_days=30, batch_size=5000):
+        """انتقال امانت‌های برگشت‌خورده قدیمی به جدول آرشیو به صورت دسته‌ای"""
+        cutoff = datetime.now() - timedelta(days=older_than_days)
+        archived = 0
         conn = self.get_connection()
         try:
             cur = conn.cursor()
+            while True:
+                # هر دسته در یک تراکنش جداگانه منتقل می‌شود تا قفل‌ها کوتاه بمانند
+                # id تکراری در آرشیو کل دسته را با خطا برمی‌گرداند تا ردیفی بدون آرشیو حذف نشود
+                cur.execute("""
+                    WITH moved AS (
+                        DELETE FROM borrowings
+                        WHERE id IN (
+                            SELECT id FROM borrowings
+                            WHERE is_returned = TRUE AND return_date < %s
+                            ORDER BY return_date
+                            LIMIT %s
+                            FOR UPDATE SKIP LOCKED
+                        )
+                        RETURNING id, book_id, member_id, borrow_date,
+                                  due_date, return_date, is_returned, branch_id
+                    )
+                    INSERT INTO borrowings_archive (id, book_id, member_id, borrow_date,
+                                                    due_date, return_date, is_returned, branch_id)
+                    SELECT id, book_id, member_id, borrow_date,
+                           due_date, return_date, is_returned, branch_id
+                    FROM moved
+                """, (cutoff, batch_size))
+                moved = cur.rowcount
+                conn.commit()
+                archived += moved
+                if moved < batch_size:
+                    break
+            cur.close()
+            return archived
+        except Error as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+    
+    def _get_loan_history(self, column, value, before, limit):
+        """تاریخچه امانت با صفحه‌بندی keyset روی (borrow_date, id)
+        
+        هر دو جدول borrowings و borrowings_archive جداگانه با ایندکس ترکیبی
+        و LIMIT خوانده می‌شوند و سپس نتیجه ادغام می‌شود.
+        before: زوج (borrow_date, id) آخرین ردیف صفحه قبل یا None
+        """
+        keyset = sql.SQL("")
+        params = [value]
+        if before:
+            keyset = sql.SQL("AND (borrow_date, id) < (%s, %s)")
+            params.extend(before)
+        params.append(limit + 1)
+        
+        branch = sql.SQL("""
+            (SELECT id, book_id, member_id, borrow_date, due_date, return_date, is_returned
+             FROM {table}
+             WHERE {column} = %s {keyset}
+             ORDER BY borrow_date DESC, id DESC
+             LIMIT %s)
+        """)
+        query = sql.SQL("""
+            SELECT 
+                h.id,
+                books.id as book_id,
+                books.title,
+                books.author,
+                members.id as member_id,
+                members.full_name,
+                h.borrow_date,
+                h.due_date,
+                h.return_date,
+                h.is_returned
+            FROM ({hot} UNION ALL {cold}) h
+            JOIN books ON h.book_id = books.id
+            JOIN members ON h.member_id = members.id
+            ORDER BY h.borrow_date DESC, h.id DESC
+            LIMIT %s
+        """).format(
+            hot=branch.format(table=sql.Identifier('borrowings'),
+                              column=sql.Identifier(column), keyset=keyset),
+            cold=branch.format(table=sql.Identifier('borrowings_archive'),
+                               column=sql.Identifier(column), keyset=keyset),
+        )
+        
+        conn = self.get_connection()
+        try:
+            cur = self._cursor(conn, Loan)
+            cur.execute(query, params + params + [limit + 1])
+            rows = cur.fetchall()
+            cur.close()
+        finally:
+            conn.close()
+        
+        # یک ردیف اضافه خوانده شده تا وجود صفحه بعد مشخص شود
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1].borrow_date, rows[-1].id)
+        return rows, next_cursor
+    
+    def get_member_history(self, member_id, before=None, limit=20):
+        """دریافت تاریخچه امانت‌های یک عضو"""
+        return self._get_loan_history('member_id', member_id, before, limit)
+    
+    def get_book_history(self, book_id, before=None, limit=20):
+        """دریافت تاریخچه امانت‌های یک کتاب"""
+        return self._get_loan_history('book_id', book_id, before, limit)
+    
+    def get_available_books(self):
+        """دریافت لیست کتاب‌های موجود (شامل نسخه‌های کنار گذاشته‌شده برای رزرو)"""
+        conn = self.get_connection()
+        try:
+            cur = self._cursor(conn, Book)
             cur.execute("""
                 SELECT id, title, author 
                 FROM books 
-                WHERE available_copies > 0
+                WHERE branch_id = %s
+                  AND (available_copies > 0
+                       OR EXISTS (SELECT 1 FROM holds
+                                  WHERE holds.book_id = books.id AND holds.status = 'ready'))
                 ORDER BY title
-            """)
+            """, (self.branch_id,))
             books = cur.fetchall()
             cur.close()
             return books
@@ -427,58 +1406,81 @@ class Database:
         """دریافت لیست اعضای فعال"""
         conn = self.get_connection()
         try:
-            cur = conn.cursor()
+            cur = self._cursor(conn, Member)
             cur.execute("""
                 SELECT id, full_name, phone 
                 FROM members 
-                WHERE is_active = TRUE
+                WHERE is_active = TRUE AND branch_id = %s
                 ORDER BY full_name
-            """)
+            """, (self.branch_id,))
             members = cur.fetchall()
             cur.close()
             return members
         finally:
             conn.close()
     
+    # متدهای کاربردی برای رویدادها
+    def _log_event(self, cur, event_type, description):
+        """ثبت رویداد در همان تراکنش عملیات اصلی"""
+        self._execute(cur, 'insert_event', (event_type, description, self.branch_id))
+        return cur.fetchone()
+    
+    def get_recent_events(self, limit=10):
+        """آخرین رویدادهای شعبه؛ در حالت عادی از بافر حافظه و بدون پرس‌وجو"""
+        events = self.recent_events.snapshot(limit)
+        if events is not None:
+            return events
+        
+        conn = self.get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT id, event_type, description, created_at
+                FROM events
+                WHERE branch_id = %s
+                ORDER BY id DESC
+                LIMIT %s
+            """, (self.branch_id, self.recent_events.size))
+            events = cur.fetchall()
+            cur.close()
+        except extensions.QueryCanceledError:
+            # پایان بودجه زمانی نباید به صورت لیست خالی نمایش داده شود
+            raise
+        except Error as e:
+            print(f"Error loading recent events: {e}")
+            return []
+        finally:
+            conn.close()
+        
+        self.recent_events.replace(events)
+        return events[:limit]
+    
     # متدهای کاربردی برای آمار
     def get_stats(self):
         """دریافت آمار کلی"""
         conn = self.get_connection()
         try:
-            cur = conn.cursor()
+            cur = self._cursor(conn, None)
             
             # تعداد کتاب‌ها
-            cur.execute("SELECT COUNT(*) FROM books")
+            self._execute(cur, 'count_books', (self.branch_id,))
             total_books = cur.fetchone()[0]
             
             # تعداد اعضای فعال
-            cur.execute("SELECT COUNT(*) FROM members WHERE is_active = TRUE")
+            self._execute(cur, 'count_active_members', (self.branch_id,))
             total_members = cur.fetchone()[0]
             
             # تعداد کتاب‌های امانت‌رفته
-            cur.execute("SELECT COUNT(*) FROM borrowings WHERE is_returned = FALSE")
+            self._execute(cur, 'count_open_borrowings', (self.branch_id,))
             total_borrowed = cur.fetchone()[0]
             
             # تعداد کتاب‌های معوقه
-            cur.execute("""
-                SELECT COUNT(*) FROM borrowings 
-                WHERE is_returned = FALSE AND due_date < CURRENT_DATE
-            """)
+            self._execute(cur, 'count_overdue', (self.branch_id,))
             overdue_books = cur.fetchone()[0]
             
             # کتاب‌های معوقه
-            cur.execute("""
-                SELECT 
-                    books.title,
-                    members.full_name,
-                    borrowings.due_date
-                FROM borrowings
-                JOIN books ON borrowings.book_id = books.id
-                JOIN members ON borrowings.member_id = members.id
-                WHERE borrowings.is_returned = FALSE AND borrowings.due_date < CURRENT_DATE
-                ORDER BY borrowings.due_date
-                LIMIT 5
-            """)
+            cur.row_model = Loan
+            self._execute(cur, 'overdue_list', (self.branch_id,))
             overdue_list = cur.fetchall()
             
             cur.close()
@@ -490,6 +1492,9 @@ class Database:
                 'overdue_books': overdue_books,
                 'overdue_list': overdue_list
             }
+        except extensions.QueryCanceledError:
+            # پایان بودجه زمانی نباید به صورت لیست خالی نمایش داده شود
+            raise
         except Error as e:
             print(f"Error getting stats: {e}")
             return {
@@ -518,13 +1523,165 @@ class Database:
             cur.close()
             
             if admin and self.verify_password(admin[2], password):
-                return {'id': admin[0], 'username': admin[1]}
+                return Admin(admin[0], admin[1])
             return None
         except Error as e:
             print(f"Error authenticating admin: {e}")
             return None
         finally:
             conn.close()
+    
+    def get_admin_by_id(self, admin_id):
+        """دریافت ادمین بر اساس ID"""
+        conn = self.get_connection()
+        try:
+            cur = self._cursor(conn, Admin)
+            cur.execute("""
+                SELECT id, username 
+                FROM admins 
+                WHERE id = %s
+            """, (admin_id,))
+            admin = cur.fetchone()
+            cur.close()
+            return admin
+        finally:
+            conn.close()
+    
+    def change_admin_password(self, admin_id, current_password, new_password):
+        """تغییر رمز عبور ادمین پس از بررسی رمز فعلی"""
+        conn = self.get_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT password_hash 
+                FROM admins 
+                WHERE id = %s
+                FOR UPDATE
+            """, (admin_id,))
+            result = cur.fetchone()
+            if not result:
+                raise ValueError("کاربر یافت نشد")
+            
+            if not self.verify_password(result[0], current_password):
+                return False
+            
+            cur.execute("""
+                UPDATE admins 
+                SET password_hash = %s 
+                WHERE id = %s
+            """, (self._hash_password(new_password), admin_id))
+            conn.commit()
+            cur.close()
+            return True
+        except Error as e:
+            conn.rollback()
+            raise e
+        finally:
+            conn.close()
+
+class ShardRouter:
+    """نگاشت شعبه‌های کتابخانه به shardهای پایگاه داده
+    
+    BRANCH_DATABASE_URLS به شکل "1=postgresql://...,2=postgresql://..." است؛
+    در نبود آن فقط شعبه پیش‌فرض روی DATABASE_URL وجود دارد. عملیات یک شعبه
+    فقط به shard همان شعبه می‌رود و خواندن‌های سراسری (آمار و جستجوی سراسری
+    که کاربر صریحاً انتخاب می‌کند) به صورت موازی روی همه شعبه‌ها اجرا و ادغام
+    می‌شوند. سایر متدها (مثل احراز هویت
+    ادمین) به شعبه پیش‌فرض سپرده می‌شوند.
+    
+    با STORAGE_BACKEND=memory هر شعبه به جای PostgreSQL یک MemoryStorage دارد.
+    """
+    def __init__(self):
+        default_branch = int(os.environ.get('DEFAULT_BRANCH_ID', 1))
+        mapping = os.environ.get('BRANCH_DATABASE_URLS')
+        urls = {}
+        if mapping:
+            for item in mapping.split(','):
+                branch_id, url = item.split('=', 1)
+                urls[int(branch_id.strip())] = url.strip()
+        else:
+            urls[default_branch] = None
+        
+        # STORAGE_BACKEND=memory: داده‌ها فقط در حافظه پردازه (برای آزمون و benchmark)
+        if os.environ.get('STORAGE_BACKEND', 'postgres') == 'memory':
+            self.branches = {branch_id: MemoryStorage(branch_id) for branch_id in urls}
+        else:
+            self.branches = {branch_id: Database(url, branch_id) for branch_id, url in urls.items()}
+        self.default_branch = default_branch if default_branch in self.branches else min(self.branches)
+    
+    def __getattr__(self, name):
+        if name == 'branches':
+            raise AttributeError(name)
+        return getattr(self.branches[self.default_branch], name)
+    
+    def for_branch(self, branch_id):
+        """دسترسی به داده‌های یک شعبه"""
+        try:
+            return self.branches[branch_id]
+        except KeyError:
+            raise ValueError("شعبه یافت نشد")
+    
+    def shards(self):
+        """یک نمونه Database به ازای هر پایگاه داده متمایز"""
+        shards = {}
+        for branch in self.branches.values():
+            shards.setdefault(branch.db_url, branch)
+        return list(shards.values())
+    
+    def init_db(self):
+        """ایجاد جداول روی همه shardها"""
+        for shard in self.shards():
+            shard.init_db()
+    
+    def _fan_out(self, func):
+        """اجرای موازی func روی همه شعبه‌ها؛ خروجی: لیست (branch_id, نتیجه)
+        
+        هر فراخوانی threadهای خود را دارد (شعبه اول در همان thread درخواست
+        اجرا می‌شود) تا درخواست‌های هم‌زمان پشت یک executor مشترک صف نشوند؛
+        هم‌زمانی واقعی پرس‌وجوها را pool اتصال هر shard محدود می‌کند.
+        """
+        branches = list(self.branches.values())
+        if len(branches) == 1:
+            return [(branches[0].branch_id, func(branches[0]))]
+        
+        # بودجه زمانی و ثبت زمان SQL درخواست جاری به threadهای fan-out منتقل می‌شود
+        state = dict(vars(_request_state))
+        
+        def run(branch):
+            vars(_request_state).update(state)
+            try:
+                return func(branch)
+            finally:
+                vars(_request_state).clear()
+        
+        with ThreadPoolExecutor(max_workers=len(branches) - 1, thread_name_prefix='shard') as executor:
+            futures = [executor.submit(run, branch) for branch in branches[1:]]
+            results = [func(branches[0])] + [future.result() for future in futures]
+        return [(branch.branch_id, result) for branch, result in zip(branches, results)]
+    
+    def search_books(self, search_type, keyword):
+        """جستجوی سراسری در همه شعبه‌ها؛ هر کتاب branch_id شعبه خود را دارد"""
+        results = []
+        for branch_id, rows in self._fan_out(lambda branch: branch.search_books(search_type, keyword)):
+            results.extend(rows)
+        results.sort(key=lambda book: book.title)
+        return results
+    
+    def get_stats(self):
+        """آمار سراسری همه شعبه‌ها"""
+        stats = {
+            'total_books': 0,
+            'total_members': 0,
+            'total_borrowed': 0,
+            'overdue_books': 0,
+            'overdue_list': []
+        }
+        for branch_id, branch_stats in self._fan_out(lambda branch: branch.get_stats()):
+            for key in ('total_books', 'total_members', 'total_borrowed', 'overdue_books'):
+                stats[key] += branch_stats[key]
+            stats['overdue_list'].extend(branch_stats['overdue_list'])
+        stats['overdue_list'] = sorted(stats['overdue_list'], key=lambda loan: loan.due_date)[:5]
+        return stats
 
-# نمونه Singleton از کلاس دیتابیس
-db = Database()
\ No newline at end of file
+# نمونه Singleton از مسیریاب شعبه‌ها
+db = ShardRouter()
\ No newline at end of file
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# عنوان نمایشی هر نوع رویداد
+EVENT_TITLES = {
+    'book_added': 'کتاب جدید اضافه شد',
+    'member_added': 'عضویت جدید',
+    'book_borrowed': 'امانت کتاب',
+    'book_returned': 'بازگشت کتاب',
+}
+
+
+class RecentEvents:
+    """بافر حلقوی آخرین رویدادها در هر پردازه
+
+    رویدادهایی که همین پردازه ثبت می‌کند مستقیماً به بافر اضافه می‌شوند.
+    چون پردازه‌های دیگر (workerهای gunicorn) هم رویداد ثبت می‌کنند، بافر
+    پس از max_age ثانیه کهنه در نظر گرفته می‌شود و باید از پایگاه داده
+    دوباره بارگذاری شود.
+    """
+
+    def __init__(self, size=50, max_age=30):
+        self.size = size
+        self.max_age = max_age
+        self._events = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self._loaded_at = None
+
+    def push(self, event):
+        """افزودن رویداد تازه ثبت‌شده (id, event_type, description, created_at)"""
+        with self._lock:
+            if self._loaded_at is not None:
+                self._events.append(event)
+
+    def replace(self, events):
+        """جایگزینی محتوای بافر با انتهای جدول events"""
+        with self._lock:
+            self._events.clear()
+            self._events.extend(sorted(events, key=lambda e: e[0]))
+            self._loaded_at = time.monotonic()
+
+    def snapshot(self, limit):
+        """آخرین رویدادها از جدید به قدیم، یا None اگر بافر کهنه باشد"""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age:
+                return None
+            events = sorted(self._events, key=lambda e: e[0], reverse=True)
+        return events[:limit]
+
+
+def humanize_time(moment, now=None):
+    """نمایش زمان به صورت نسبی (مثلاً ۵ دقیقه پیش)"""
+    now = now or datetime.now()
+    seconds = int((now - moment).total_seconds())
+    if seconds < 60:
+        return 'لحظاتی پیش'
+    if seconds < 3600:
+        return f'{seconds // 60} دقیقه پیش'
+    if seconds < 86400:
+        return f'{seconds // 3600} ساعت پیش'
+    return f'{seconds // 86400} روز پیش'
+
+
+def format_activity(event, now=None):
+    """تبدیل ردیف رویداد به دیکشنری مورد استفاده در داشبورد"""
+    event_id, event_type, description, created_at = event
+    return {
+        'title': EVENT_TITLES.get(event_type, event_type),
+        'time': humanize_time(created_at, now),
+        'description': description,
+    }
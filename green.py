@@ -0,0 +1,24 @@
+from psycopg2 import extensions, OperationalError
+
+
+def gevent_wait_callback(conn, timeout=None):
+    """wait callback برای psycopg2 که به جای مسدود کردن worker، کنترل را به hub گِوِنت می‌دهد"""
+    from gevent.socket import wait_read, wait_write
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise OperationalError(f"Bad result from poll: {state!r}")
+
+
+def patch_psycopg():
+    """فعال‌سازی حالت همکارانه psycopg2؛ باید پس از monkey patch گِوِنت فراخوانی شود"""
+    if not hasattr(extensions, 'set_wait_callback'):
+        raise ImportError("psycopg2 wait callbacks are not supported")
+    extensions.set_wait_callback(gevent_wait_callback)
@@ -0,0 +1,31 @@
+import multiprocessing
+import os
+
+# تنظیمات gunicorn؛ اجرا با: gunicorn -c gunicorn.conf.py wsgi:app
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', 5000)}")
+
+# gevent: هر worker صدها درخواست هم‌زمان را به صورت green thread سرویس می‌دهد
+# sync: هر worker در هر لحظه فقط یک درخواست
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gevent')
+# با gevent هم‌زمانی از green threadها می‌آید و یک worker برای هر هسته کافی است
+default_workers = multiprocessing.cpu_count()
+if worker_class != 'gevent':
+    default_workers = default_workers * 2 + 1
+workers = int(os.environ.get('GUNICORN_WORKERS', default_workers))
+worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 1000))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+# سقف کل اتصال‌های همه workerها به هر shard؛ باید از max_connections پستگرس
+# (پیش‌فرض ۱۰۰) منهای اتصال‌های دستورات نگهداری کمتر باشد. pool هر worker سهمی
+# از این بودجه است و درخواست‌های اضافه به جای خطا در صف pool منتظر می‌مانند.
+# هر worker یک اتصال دیگر هم برای LISTEN باطل‌سازی cache جستجو دارد.
+db_connection_budget = int(os.environ.get('DB_CONNECTION_BUDGET', 80))
+os.environ.setdefault('DB_POOL_MAX', str(max(db_connection_budget // workers - 1, 2)))
+
+
+def post_worker_init(worker):
+    """فعال‌سازی wait callback گِوِنت برای psycopg2 پس از monkey patch در worker"""
+    if worker_class == 'gevent':
+        from green import patch_psycopg
+        patch_psycopg()
@@ -0,0 +1,87 @@
+import os
+import select
+import socket
+import threading
+from functools import wraps
+
+from flask import jsonify, render_template, request
+from psycopg2 import extensions, pool
+
+from database import set_request_budget, clear_request_budget
+
+# ثانیه‌هایی که به کاربر پیشنهاد می‌شود پیش از تلاش دوباره صبر کند
+RETRY_AFTER = int(os.environ.get('OVERLOAD_RETRY_AFTER', 5))
+
+# فاصله بررسی قطع اتصال کاربر (ثانیه)
+DISCONNECT_POLL_INTERVAL = 0.2
+
+
+def _client_disconnected(sock):
+    """آیا کاربر اتصال را بسته است؛ None یعنی قابل تشخیص نیست"""
+    readable, _, _ = select.select([sock], [], [], 0)
+    if not readable:
+        return False
+    # خواندن صفر بایت یعنی FIN از سمت کاربر؛ داده یعنی درخواست بعدی keep-alive
+    return None if sock.recv(1, socket.MSG_PEEK) else True
+
+
+def _watch_disconnect(sock, active, done):
+    """لغو پرس‌وجوهای در حال اجرای درخواست وقتی کاربر اتصال را می‌بندد"""
+    while not done.wait(DISCONNECT_POLL_INTERVAL):
+        try:
+            disconnected = _client_disconnected(sock)
+        except (OSError, ValueError):
+            disconnected = True
+        if disconnected is None:
+            return
+        if disconnected:
+            for conn in list(active):
+                conn.cancel()
+            return
+
+
+def query_budget(timeout_ms):
+    """بودجه زمانی پرس‌وجوهای یک route
+
+    همه اتصال‌هایی که route می‌گیرد با statement_timeout برابر timeout_ms
+    کار می‌کنند. اگر سرور socket کاربر را در اختیار بگذارد (gunicorn)، با
+    قطع اتصال کاربر پرس‌وجوهای در حال اجرا لغو می‌شوند.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            active = []
+            set_request_budget(timeout_ms, active)
+            sock = request.environ.get('gunicorn.socket')
+            done = threading.Event()
+            if sock is not None:
+                threading.Thread(target=_watch_disconnect, args=(sock, active, done),
+                                 daemon=True).start()
+            try:
+                return view(*args, **kwargs)
+            finally:
+                done.set()
+                clear_request_budget()
+        return wrapper
+    return decorator
+
+
+def _overloaded(message):
+    """پاسخ 503 با Retry-After؛ JSON برای مسیرهای API"""
+    if request.path.startswith('/api/'):
+        response = jsonify({'error': message})
+    else:
+        response = render_template('503.html', message=message)
+    return response, 503, {'Retry-After': str(RETRY_AFTER)}
+
+
+def init_load_shedding(app):
+    """ثبت پاسخ 503 برای رد شدن در pool و پایان بودجه زمانی پرس‌وجو"""
+
+    @app.errorhandler(pool.PoolError)
+    def pool_overloaded(e):
+        return _overloaded('سرور در حال حاضر بار زیادی دارد. لطفاً چند لحظه بعد دوباره تلاش کنید.')
+
+    @app.errorhandler(extensions.QueryCanceledError)
+    def query_timed_out(e):
+        return _overloaded('پاسخ این درخواست بیش از حد طول کشید. لطفاً دوباره تلاش کنید.')
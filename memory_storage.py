@@ -0,0 +1,391 @@
+import os
+import threading
+from bisect import bisect_left
+from collections import defaultdict, deque
+from datetime import datetime, timedelta
+from itertools import count
+
+from models import Book, Member, Loan, Hold, Admin
+from storage import LibraryStorage
+
+
+class MemoryStorage(LibraryStorage):
+    """backend درون‌حافظه‌ای با همان رفتار Database برای یک شعبه
+
+    ردیف‌ها در دیکشنری‌هایی بر اساس id نگه داشته می‌شوند و ایندکس‌های جانبی
+    (امانت‌های فعال هر کتاب، امانت‌های هر عضو و هر کتاب، صف رزرو هر کتاب)
+    همان نقش ایندکس‌های PostgreSQL را دارند. همه عملیات زیر یک قفل اجرا
+    می‌شوند تا مثل تراکنش اتمیک باشند. idها به ترتیب زمان ثبت داده می‌شوند،
+    پس ترتیب id همان ترتیب borrow_date است.
+    """
+    backend = 'memory'
+
+    def __init__(self, branch_id=None):
+        self.branch_id = branch_id or int(os.environ.get('DEFAULT_BRANCH_ID', 1))
+        self.db_url = f"memory://{self.branch_id}"
+        self._lock = threading.RLock()
+        self._ids = defaultdict(lambda: count(1))
+
+        self.admins = {}
+        self.members = {}
+        self.books = {}
+        self.borrowings = {}
+        self.holds = {}
+        self.events = deque(maxlen=int(os.environ.get('MEMORY_EVENTS_SIZE', 1000)))
+
+        self._admins_by_username = {}
+        self._isbns = {}
+        self._open_by_book = defaultdict(list)
+        self._loans_by_member = defaultdict(list)
+        self._loans_by_book = defaultdict(list)
+        self._hold_queue = defaultdict(deque)
+        self._ready_holds = {}
+
+    def _next_id(self, table):
+        return next(self._ids[table])
+
+    def init_db(self):
+        """ایجاد ادمین پیش‌فرض"""
+        self.create_default_admin()
+
+    # ادمین‌ها
+    def create_default_admin(self):
+        """ایجاد کاربر ادمین پیش‌فرض"""
+        admin_username = os.environ.get('ADMIN_USERNAME', 'admin')
+        admin_password = os.environ.get('ADMIN_PASSWORD', 'admin123')
+        with self._lock:
+            if admin_username in self._admins_by_username:
+                return
+            admin_id = self._next_id('admins')
+            self.admins[admin_id] = {
+                'id': admin_id,
+                'username': admin_username,
+                'password_hash': self._hash_password(admin_password),
+                'created_at': datetime.now(),
+            }
+            self._admins_by_username[admin_username] = admin_id
+
+    def authenticate_admin(self, username, password):
+        with self._lock:
+            admin = self.admins.get(self._admins_by_username.get(username))
+            if admin and self.verify_password(admin['password_hash'], password):
+                return Admin(admin['id'], admin['username'])
+            return None
+
+    def get_admin_by_id(self, admin_id):
+        with self._lock:
+            admin = self.admins.get(admin_id)
+            return Admin(admin['id'], admin['username']) if admin else None
+
+    def change_admin_password(self, admin_id, current_password, new_password):
+        with self._lock:
+            admin = self.admins.get(admin_id)
+            if not admin:
+                raise ValueError("کاربر یافت نشد")
+            if not self.verify_password(admin['password_hash'], current_password):
+                return False
+            admin['password_hash'] = self._hash_password(new_password)
+            return True
+
+    # اعضا
+    @staticmethod
+    def _member_row(member):
+        return Member(member['id'], member['full_name'], member['phone'], member['email'],
+                      member['address'], member['join_date'], member['is_active'])
+
+    def get_all_members(self):
+        with self._lock:
+            members = [m for m in self.members.values() if m['is_active']]
+            members.sort(key=lambda m: m['full_name'])
+            return [self._member_row(m) for m in members]
+
+    def get_member_by_id(self, member_id):
+        with self._lock:
+            member = self.members.get(member_id)
+            return self._member_row(member) if member else None
+
+    def add_member(self, full_name, phone, email, address):
+        with self._lock:
+            member_id = self._next_id('members')
+            self.members[member_id] = {
+                'id': member_id,
+                'full_name': full_name,
+                'phone': phone,
+                'email': email,
+                'address': address,
+                'join_date': datetime.now(),
+                'is_active': True,
+            }
+            self._log_event('member_added', f'عضو جدید "{full_name}" ثبت نام کرد')
+            return member_id
+
+    def deactivate_member(self, member_id):
+        with self._lock:
+            if member_id in self.members:
+                self.members[member_id]['is_active'] = False
+
+    def get_active_members(self):
+        with self._lock:
+            members = [m for m in self.members.values() if m['is_active']]
+            members.sort(key=lambda m: m['full_name'])
+            return [Member(m['id'], m['full_name'], m['phone']) for m in members]
+
+    # کتاب‌ها
+    def get_all_books(self):
+        with self._lock:
+            books = sorted(self.books.values(), key=lambda b: b['title'])
+            return [Book(b['id'], b['title'], b['author'], b['isbn'], b['publication_year'],
+                         b['total_copies'], b['available_copies'], b['created_at']) for b in books]
+
+    def get_book_by_id(self, book_id):
+        with self._lock:
+            b = self.books.get(book_id)
+            if not b:
+                return None
+            return Book(b['id'], b['title'], b['author'], b['isbn'], b['publication_year'],
+                        b['total_copies'], b['available_copies'])
+
+    def add_book(self, title, author, isbn, publication_year, total_copies):
+        with self._lock:
+            if isbn and isbn in self._isbns:
+                raise ValueError("کتابی با این شابک قبلاً ثبت شده است")
+            book_id = self._next_id('books')
+            self.books[book_id] = {
+                'id': book_id,
+                'title': title,
+                'author': author,
+                'isbn': isbn,
+                'publication_year': publication_year,
+                'total_copies': total_copies,
+                'available_copies': total_copies,
+                'created_at': datetime.now(),
+            }
+            if isbn:
+                self._isbns[isbn] = book_id
+            self._log_event('book_added', f'کتاب "{title}" اضافه شد')
+            return book_id
+
+    def delete_book(self, book_id):
+        with self._lock:
+            book = self.books.pop(book_id, None)
+            if not book:
+                return
+            if book['isbn']:
+                self._isbns.pop(book['isbn'], None)
+            # حذف آبشاری امانت‌ها و رزروهای کتاب
+            for borrowing_id in self._loans_by_book.pop(book_id, []):
+                borrowing = self.borrowings.pop(borrowing_id)
+                self._loans_by_member[borrowing['member_id']].remove(borrowing_id)
+            self._open_by_book.pop(book_id, None)
+            self._hold_queue.pop(book_id, None)
+            for hold_id in [h['id'] for h in self.holds.values() if h['book_id'] == book_id]:
+                hold = self.holds.pop(hold_id)
+                self._ready_holds.pop((book_id, hold['member_id']), None)
+
+    def has_open_borrowings(self, book_id):
+        with self._lock:
+            return bool(self._open_by_book.get(book_id))
+
+    def search_books(self, search_type, keyword):
+        with self._lock:
+            field = 'title' if search_type == 'title' else 'author'
+            keyword = keyword.lower()
+            books = [b for b in self.books.values() if keyword in b[field].lower()]
+            books.sort(key=lambda b: b['title'])
+            return [Book(b['id'], b['title'], b['author'], available_copies=b['available_copies'],
+                         branch_id=self.branch_id) for b in books]
+
+    def get_available_books(self):
+        with self._lock:
+            ready_books = {book_id for book_id, member_id in self._ready_holds}
+            books = [b for b in self.books.values()
+                     if b['available_copies'] > 0 or b['id'] in ready_books]
+            books.sort(key=lambda b: b['title'])
+            return [Book(b['id'], b['title'], b['author']) for b in books]
+
+    def get_unavailable_books(self):
+        with self._lock:
+            books = [b for b in self.books.values() if b['available_copies'] < 1]
+            books.sort(key=lambda b: b['title'])
+            return [Book(b['id'], b['title'], b['author']) for b in books]
+
+    # امانت‌ها
+    def borrow_book(self, book_id, member_id, days):
+        with self._lock:
+            book = self.books.get(book_id)
+            if not book:
+                raise ValueError("کتاب یافت نشد")
+
+            member = self.members.get(member_id)
+            if not member:
+                raise ValueError("عضو یافت نشد")
+
+            # اگر نسخه‌ای برای رزرو این عضو کنار گذاشته شده، همان تحویل داده می‌شود
+            hold_id = self._ready_holds.pop((book_id, member_id), None)
+            if hold_id is not None:
+                self.holds[hold_id]['status'] = 'fulfilled'
+            elif book['available_copies'] < 1:
+                raise ValueError("کتاب موجود نیست")
+            else:
+                book['available_copies'] -= 1
+
+            due_date = datetime.now() + timedelta(days=days)
+            borrowing_id = self._next_id('borrowings')
+            self.borrowings[borrowing_id] = {
+                'id': borrowing_id,
+                'book_id': book_id,
+                'member_id': member_id,
+                'borrow_date': datetime.now(),
+                'due_date': due_date,
+                'return_date': None,
+                'is_returned': False,
+            }
+            self._open_by_book[book_id].append(borrowing_id)
+            self._loans_by_book[book_id].append(borrowing_id)
+            self._loans_by_member[member_id].append(borrowing_id)
+
+            self._log_event('book_borrowed',
+                            f'کتاب "{book["title"]}" به {member["full_name"]} امانت داده شد')
+            return due_date
+
+    def return_book(self, book_id):
+        with self._lock:
+            open_loans = self._open_by_book.get(book_id)
+            if not open_loans:
+                raise ValueError("هیچ امانت فعالی برای این کتاب یافت نشد")
+
+            borrowing = self.borrowings[open_loans.pop()]
+            borrowing['is_returned'] = True
+            borrowing['return_date'] = datetime.now()
+
+            hold = self._allocate_copy(book_id)
+
+            member = self.members[borrowing['member_id']]
+            self._log_event('book_returned',
+                            f'کتاب "{self.books[book_id]["title"]}" توسط {member["full_name"]} بازگردانده شد')
+            return hold
+
+    def get_borrowed_books(self):
+        with self._lock:
+            loans = [self.borrowings[borrowing_id]
+                     for borrowing_ids in self._open_by_book.values()
+                     for borrowing_id in borrowing_ids]
+            loans.sort(key=lambda l: l['due_date'])
+            return [self._loan_row(l) for l in loans]
+
+    def _loan_row(self, loan):
+        book = self.books[loan['book_id']]
+        member = self.members[loan['member_id']]
+        return Loan(loan['id'], book['id'], book['title'], book['author'],
+                    member['id'], member['full_name'], loan['borrow_date'], loan['due_date'],
+                    loan['return_date'], loan['is_returned'])
+
+    def _get_loan_history(self, borrowing_ids, before, limit):
+        """تاریخچه با صفحه‌بندی keyset؛ لیست idها صعودی است"""
+        end = bisect_left(borrowing_ids, before[1]) if before else len(borrowing_ids)
+        page = borrowing_ids[max(end - limit - 1, 0):end][::-1]
+        rows = []
+        for borrowing_id in page:
+            rows.append(self._loan_row(self.borrowings[borrowing_id]))
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = (rows[-1].borrow_date, rows[-1].id)
+        return rows, next_cursor
+
+    def get_member_history(self, member_id, before=None, limit=20):
+        with self._lock:
+            return self._get_loan_history(self._loans_by_member.get(member_id, []), before, limit)
+
+    def get_book_history(self, book_id, before=None, limit=20):
+        with self._lock:
+            return self._get_loan_history(self._loans_by_book.get(book_id, []), before, limit)
+
+    # رزروها
+    def _allocate_copy(self, book_id):
+        """تخصیص نسخه آزادشده به ابتدای صف رزرو یا افزایش موجودی"""
+        queue = self._hold_queue.get(book_id)
+        while queue:
+            hold = self.holds.get(queue.popleft())
+            # رزروهای لغوشده در صف باقی می‌مانند و اینجا رد می‌شوند
+            if hold and hold['status'] == 'waiting':
+                hold['status'] = 'ready'
+                hold['ready_at'] = datetime.now()
+                self._ready_holds[(book_id, hold['member_id'])] = hold['id']
+                return (hold['id'], hold['member_id'])
+        self.books[book_id]['available_copies'] += 1
+        return None
+
+    def place_hold(self, book_id, member_id):
+        with self._lock:
+            book = self.books.get(book_id)
+            if not book:
+                raise ValueError("کتاب یافت نشد")
+            if member_id not in self.members:
+                raise ValueError("عضو یافت نشد")
+            if book['available_copies'] > 0:
+                raise ValueError("کتاب موجود است و می‌توان آن را مستقیماً امانت داد")
+
+            for hold in self.holds.values():
+                if (hold['book_id'] == book_id and hold['member_id'] == member_id
+                        and hold['status'] in ('waiting', 'ready')):
+                    raise ValueError("این عضو قبلاً این کتاب را رزرو کرده است")
+
+            hold_id = self._next_id('holds')
+            self.holds[hold_id] = {
+                'id': hold_id,
+                'book_id': book_id,
+                'member_id': member_id,
+                'created_at': datetime.now(),
+                'status': 'waiting',
+                'ready_at': None,
+            }
+            self._hold_queue[book_id].append(hold_id)
+            return hold_id
+
+    def cancel_hold(self, hold_id):
+        with self._lock:
+            hold = self.holds.get(hold_id)
+            if not hold or hold['status'] not in ('waiting', 'ready'):
+                raise ValueError("رزرو فعالی با این کد یافت نشد")
+
+            was_ready = hold['status'] == 'ready'
+            hold['status'] = 'cancelled'
+            if was_ready:
+                self._ready_holds.pop((hold['book_id'], hold['member_id']), None)
+                self._allocate_copy(hold['book_id'])
+
+    def get_active_holds(self):
+        with self._lock:
+            holds = [h for h in self.holds.values() if h['status'] in ('waiting', 'ready')]
+            holds.sort(key=lambda h: (self.books[h['book_id']]['title'], h['created_at']))
+            return [Hold(h['id'], h['book_id'], self.books[h['book_id']]['title'],
+                         h['member_id'], self.members[h['member_id']]['full_name'],
+                         h['created_at'], h['status'], h['ready_at']) for h in holds]
+
+    # رویدادها و آمار
+    def _log_event(self, event_type, description):
+        self.events.append((self._next_id('events'), event_type, description, datetime.now()))
+
+    def get_recent_events(self, limit=10):
+        with self._lock:
+            return list(self.events)[::-1][:limit]
+
+    def get_stats(self):
+        with self._lock:
+            overdue_before = datetime.combine(datetime.now().date(), datetime.min.time())
+            open_loans = [self.borrowings[borrowing_id]
+                          for borrowing_ids in self._open_by_book.values()
+                          for borrowing_id in borrowing_ids]
+            overdue = sorted((l for l in open_loans if l['due_date'] < overdue_before),
+                             key=lambda l: l['due_date'])
+            return {
+                'total_books': len(self.books),
+                'total_members': sum(1 for m in self.members.values() if m['is_active']),
+                'total_borrowed': len(open_loans),
+                'overdue_books': len(overdue),
+                'overdue_list': [Loan(title=self.books[l['book_id']]['title'],
+                                      full_name=self.members[l['member_id']]['full_name'],
+                                      due_date=l['due_date']) for l in overdue[:5]]
+            }
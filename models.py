@@ -0,0 +1,108 @@
+from datetime import date, datetime
+from typing import NamedTuple, Optional
+
+
+def format_date(value, fmt='%Y-%m-%d'):
+    """قالب‌بندی تاریخ؛ فقط هنگام نمایش فراخوانی می‌شود نه هنگام خواندن ردیف"""
+    return value.strftime(fmt) if value is not None else None
+
+
+def _is_past_due(due_date):
+    """معوقه بودن با همان معیار پایگاه داده (due_date < CURRENT_DATE)"""
+    return due_date is not None and due_date.date() < date.today()
+
+
+# مدل‌ها NamedTuple هستند: مثل tuple فشرده‌اند (بدون __dict__ برای هر ردیف)
+# و فیلدها با نام در دسترس‌اند. ستون‌هایی که یک پرس‌وجو برنمی‌گرداند مقدار
+# پیش‌فرض None می‌گیرند.
+
+class Book(NamedTuple):
+    id: int
+    title: str
+    author: str
+    isbn: Optional[str] = None
+    publication_year: Optional[int] = None
+    total_copies: Optional[int] = None
+    available_copies: Optional[int] = None
+    created_at: Optional[datetime] = None
+    branch_id: Optional[int] = None
+
+    @property
+    def is_available(self):
+        return bool(self.available_copies) and self.available_copies > 0
+
+    @property
+    def created_on(self):
+        return format_date(self.created_at)
+
+
+class Member(NamedTuple):
+    id: int
+    full_name: str
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    address: Optional[str] = None
+    join_date: Optional[datetime] = None
+    is_active: bool = True
+
+    @property
+    def joined_on(self):
+        return format_date(self.join_date)
+
+
+class Loan(NamedTuple):
+    """یک امانت (فعال یا از تاریخچه) همراه عنوان کتاب و نام عضو"""
+    id: Optional[int] = None
+    book_id: Optional[int] = None
+    title: Optional[str] = None
+    author: Optional[str] = None
+    member_id: Optional[int] = None
+    full_name: Optional[str] = None
+    borrow_date: Optional[datetime] = None
+    due_date: Optional[datetime] = None
+    return_date: Optional[datetime] = None
+    is_returned: bool = False
+
+    @property
+    def is_overdue(self):
+        return not self.is_returned and _is_past_due(self.due_date)
+
+    @property
+    def status(self):
+        return 'معوقه' if self.is_overdue else 'در امانت'
+
+    @property
+    def borrowed_on(self):
+        return format_date(self.borrow_date)
+
+    @property
+    def due_on(self):
+        return format_date(self.due_date)
+
+    @property
+    def returned_on(self):
+        return format_date(self.return_date)
+
+
+class Hold(NamedTuple):
+    id: int
+    book_id: int
+    title: str
+    member_id: int
+    full_name: str
+    created_at: datetime
+    status: str
+    ready_at: Optional[datetime] = None
+
+    @property
+    def is_ready(self):
+        return self.status == 'ready'
+
+    @property
+    def placed_on(self):
+        return format_date(self.created_at)
+
+
+class Admin(NamedTuple):
+    id: int
+    username: str
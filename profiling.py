@@ -0,0 +1,325 @@
+import itertools
+import json
+import os
+import re
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import before_render_template, g, request, template_rendered
+from flask_login import current_user
+
+from database import track_sql_time
+
+try:
+    # زیر gevent نمونه‌بردار باید یک thread واقعی سیستم‌عامل باشد؛ thread سبز
+    # فقط وقتی اجرا می‌شود که درخواست‌ها کنترل را رها کنند
+    from gevent import monkey
+    _start_thread = monkey.get_original('_thread', 'start_new_thread')
+    _get_ident = monkey.get_original('_thread', 'get_ident')
+    _sleep = monkey.get_original('time', 'sleep')
+except ImportError:
+    from _thread import start_new_thread as _start_thread, get_ident as _get_ident
+    from time import sleep as _sleep
+
+# پوشه ذخیره profileها: <PROFILE_DIR>/<endpoint>/<زمان>-<id>.json و .folded
+PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+# profile خودکار یک درخواست از هر N درخواست؛ 0 یعنی فقط درخواست‌های علامت‌دار
+SAMPLE_RATE = int(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+# فاصله نمونه‌برداری از stack (میلی‌ثانیه)
+INTERVAL_MS = float(os.environ.get('PROFILE_INTERVAL', 5))
+# تعداد profileهای نگه‌داشته‌شده برای هر route
+KEEP = int(os.environ.get('PROFILE_KEEP', 50))
+
+# درخواست‌هایی که در حالت انتظار (I/O یا اجرای green thread دیگر) نمونه‌برداری شده‌اند
+WAITING = '<waiting>'
+
+_NAME_RE = re.compile(r'^[\w.-]+$')
+_request_counter = itertools.count()
+
+
+def _short_path(filename):
+    """مسیر کوتاه فایل برای برچسب stack (نسبت به site-packages یا پروژه)"""
+    marker = 'site-packages' + os.sep
+    index = filename.rfind(marker)
+    if index != -1:
+        return filename[index + len(marker):]
+    try:
+        return os.path.relpath(filename)
+    except ValueError:
+        return filename
+
+
+class ProfileRun:
+    """داده‌های profile یک درخواست: stackهای نمونه‌برداری‌شده و زمان‌ها"""
+
+    def __init__(self, thread_id, root, reason):
+        self.id = uuid.uuid4().hex[:12]
+        self.thread_id = thread_id
+        self.root = root
+        self.reason = reason
+        self.stacks = Counter()
+        self.sql_timings = []
+        self.template_time = 0.0
+        self.template_started = []
+        self.started_at = datetime.now()
+        self.started = time.perf_counter()
+        self.duration = None
+
+    @property
+    def samples(self):
+        return sum(self.stacks.values())
+
+
+class SamplingProfiler:
+    """نمونه‌بردار stack برای درخواست‌های در حال profile
+
+    یک thread برای همه درخواست‌های فعال هر INTERVAL_MS یک بار stack
+    threadهای آن‌ها را با sys._current_frames می‌خواند و تا frame ریشه
+    درخواست (wsgi_app) به صورت collapsed ثبت می‌کند. زیر gevent همه درخواست‌ها
+    روی یک thread هستند؛ اگر frame ریشه یک درخواست در stack نباشد آن درخواست
+    در انتظار بوده و نمونه با برچسب <waiting> ثبت می‌شود. thread فقط تا وقتی
+    درخواستی در حال profile است اجرا می‌شود.
+    """
+
+    def __init__(self, interval_ms=INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.runs = {}
+        self._running = False
+        self._labels = {}
+
+    def start(self, run):
+        self.runs[run.id] = run
+        if not self._running:
+            self._running = True
+            _start_thread(self._loop, ())
+
+    def stop(self, run):
+        self.runs.pop(run.id, None)
+        run.duration = time.perf_counter() - run.started
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = f'{_short_path(code.co_filename)}:{code.co_name}'
+        return label
+
+    def _collapse(self, frame, root):
+        """stack از ریشه درخواست تا frame جاری؛ None اگر ریشه در stack نباشد"""
+        labels = []
+        while frame is not None:
+            labels.append(self._label(frame.f_code))
+            if frame is root:
+                return ';'.join(reversed(labels))
+            frame = frame.f_back
+        return None if root is not None else ';'.join(reversed(labels))
+
+    def _sample(self):
+        runs = tuple(self.runs.values())
+        if not runs:
+            return False
+        frames = sys._current_frames()
+        for run in runs:
+            frame = frames.get(run.thread_id)
+            stack = self._collapse(frame, run.root) if frame is not None else None
+            run.stacks[stack or WAITING] += 1
+        return True
+
+    def _loop(self):
+        try:
+            while True:
+                _sleep(self.interval)
+                if not self._sample():
+                    self._running = False
+                    # درخواستی که هم‌زمان با توقف شروع شده بدون نمونه‌بردار نماند
+                    if not self.runs or self._running:
+                        return
+                    self._running = True
+        except Exception as e:
+            self._running = False
+            print(f"Error in sampling profiler: {e}")
+
+
+profiler = SamplingProfiler()
+
+
+def _request_root():
+    """frame مربوط به Flask.wsgi_app درخواست جاری؛ ریشه stackهای ثبت‌شده"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_name == 'wsgi_app':
+            return frame
+        frame = frame.f_back
+    return None
+
+
+def _profile_reason():
+    """علت profile درخواست جاری یا None
+
+    درخواست صریح (هدر X-Profile: 1 یا ?profile=1) فقط برای کاربر واردشده
+    پذیرفته می‌شود؛ در غیر این صورت از هر SAMPLE_RATE درخواست یکی انتخاب می‌شود.
+    """
+    if request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1':
+        if current_user.is_authenticated:
+            return 'requested'
+    if SAMPLE_RATE > 0 and next(_request_counter) % SAMPLE_RATE == 0:
+        return 'sampled'
+    return None
+
+
+def _save_profile(run, endpoint):
+    """ذخیره خلاصه (json) و stackهای collapsed (folded) و حذف profileهای قدیمی route"""
+    directory = os.path.join(PROFILE_DIR, endpoint)
+    os.makedirs(directory, exist_ok=True)
+    name = f"{run.started_at.strftime('%Y%m%d-%H%M%S')}-{run.id}"
+
+    duration_ms = run.duration * 1000
+    sql_ms = sum(run.sql_timings) * 1000
+    template_ms = run.template_time * 1000
+    summary = {
+        'id': run.id,
+        'name': name,
+        'route': endpoint,
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'reason': run.reason,
+        'started_at': run.started_at.isoformat(timespec='seconds'),
+        'duration_ms': round(duration_ms, 2),
+        'sql_ms': round(sql_ms, 2),
+        'sql_count': len(run.sql_timings),
+        'template_ms': round(template_ms, 2),
+        # پرس‌وجوهای fan-out هم‌زمان اجرا می‌شوند و مجموعشان ممکن است از کل بیشتر باشد
+        'python_ms': round(max(duration_ms - sql_ms - template_ms, 0), 2),
+        'samples': run.samples,
+        'waiting_samples': run.stacks[WAITING],
+        'interval_ms': profiler.interval * 1000,
+    }
+    with open(os.path.join(directory, name + '.folded'), 'w', encoding='utf-8') as f:
+        for stack, count in run.stacks.most_common():
+            f.write(f'{stack} {count}\n')
+    with open(os.path.join(directory, name + '.json'), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+
+    names = sorted(n[:-len('.json')] for n in os.listdir(directory) if n.endswith('.json'))
+    for old in names[:-KEEP] if KEEP > 0 else ():
+        for suffix in ('.json', '.folded'):
+            try:
+                os.remove(os.path.join(directory, old + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def valid_name(name):
+    """نام route یا profile بدون امکان خروج از PROFILE_DIR"""
+    return bool(_NAME_RE.match(name)) and name not in ('.', '..')
+
+
+def list_profiles(limit=50):
+    """خلاصه routeها و آخرین profileها (جدیدترین اول)"""
+    profiles = []
+    if os.path.isdir(PROFILE_DIR):
+        for route in os.listdir(PROFILE_DIR):
+            directory = os.path.join(PROFILE_DIR, route)
+            if not valid_name(route) or not os.path.isdir(directory):
+                continue
+            for name in os.listdir(directory):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(directory, name), encoding='utf-8') as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError) as e:
+                    print(f"Error reading profile {name}: {e}")
+    profiles.sort(key=lambda p: p['name'][:15], reverse=True)
+
+    routes = {}
+    for p in profiles:
+        route = routes.setdefault(p['route'], {'route': p['route'], 'count': 0,
+                                               'total_ms': 0.0, 'max_ms': 0.0, 'sql_ms': 0.0})
+        route['count'] += 1
+        route['total_ms'] += p['duration_ms']
+        route['sql_ms'] += p['sql_ms']
+        route['max_ms'] = max(route['max_ms'], p['duration_ms'])
+    for route in routes.values():
+        route['avg_ms'] = route['total_ms'] / route['count']
+        route['avg_sql_ms'] = route['sql_ms'] / route['count']
+    return sorted(routes.values(), key=lambda r: r['avg_ms'], reverse=True), profiles[:limit]
+
+
+def load_profile(route, name, top=30):
+    """خلاصه یک profile به همراه پرتکرارترین stackها و توابع (self)
+
+    خروجی: (خلاصه، [(stack، تعداد)]، [(تابع، تعداد)]) یا None
+    """
+    if not valid_name(route) or not valid_name(name):
+        return None
+    base = os.path.join(PROFILE_DIR, route, name)
+    try:
+        with open(base + '.json', encoding='utf-8') as f:
+            summary = json.load(f)
+        stacks = []
+        with open(base + '.folded', encoding='utf-8') as f:
+            for line in f:
+                stack, _, count = line.rstrip('\n').rpartition(' ')
+                stacks.append((stack, int(count)))
+    except FileNotFoundError:
+        return None
+    functions = Counter()
+    for stack, count in stacks:
+        functions[stack.rsplit(';', 1)[-1]] += count
+    stacks.sort(key=lambda item: item[1], reverse=True)
+    return summary, stacks[:top], functions.most_common(top)
+
+
+def init_profiling(app, skip_endpoints=()):
+    """ثبت hookهای profile درخواست روی app
+
+    skip_endpoints: endpointهایی که هرگز profile نمی‌شوند (مثل صفحات خود profiler)
+    """
+    skip = {'static', *skip_endpoints}
+
+    @app.before_request
+    def start_profile():
+        if request.endpoint is None or request.endpoint in skip:
+            return
+        reason = _profile_reason()
+        if reason is None:
+            return
+        run = ProfileRun(_get_ident(), _request_root(), reason)
+        g.profile_run = run
+        track_sql_time(run.sql_timings)
+        profiler.start(run)
+
+    @app.after_request
+    def add_profile_header(response):
+        run = g.get('profile_run')
+        if run is not None:
+            response.headers['X-Profile-Id'] = run.id
+        return response
+
+    @app.teardown_request
+    def finish_profile(exc):
+        run = g.pop('profile_run', None)
+        if run is None:
+            return
+        profiler.stop(run)
+        track_sql_time(None)
+        try:
+            _save_profile(run, request.endpoint)
+        except OSError as e:
+            print(f"Error saving profile: {e}")
+
+    def template_started(sender, template, context, **extra):
+        run = g.get('profile_run')
+        if run is not None:
+            run.template_started.append(time.perf_counter())
+
+    def template_finished(sender, template, context, **extra):
+        run = g.get('profile_run')
+        if run is not None and run.template_started:
+            run.template_time += time.perf_counter() - run.template_started.pop()
+
+    before_render_template.connect(template_started, app, weak=False)
+    template_rendered.connect(template_finished, app, weak=False)
@@ -0,0 +1,292 @@
+import importlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from psycopg2 import Error
+from psycopg2.extras import execute_values
+
+
+class LogSender:
+    """ارسال‌کننده محلی: هر یادآوری یک خط JSON در فایل لاگ
+
+    جایگزین سرویس ایمیل/پیامک در توسعه؛ ارسال‌کننده واقعی باید همین متد
+    send_batch را پیاده‌سازی کند.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get('REMINDER_LOG_PATH', 'reminders.log')
+        self._lock = threading.Lock()
+
+    def send_batch(self, reminders):
+        """ارسال یک دسته؛ خروجی: دیکشنری id -> پیام خطا برای موارد ناموفق"""
+        lines = []
+        for reminder in reminders:
+            lines.append(json.dumps({
+                'id': reminder['id'],
+                'to': reminder['email'] or reminder['phone'],
+                'member': reminder['full_name'],
+                'book': reminder['title'],
+                'due_date': reminder['due_date'].isoformat(),
+                'sent_at': datetime.now().isoformat(),
+            }, ensure_ascii=False))
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+        return {}
+
+
+def load_sender(spec=None):
+    """ساخت ارسال‌کننده از REMINDER_SENDER به شکل 'module:Class'"""
+    spec = spec or os.environ.get('REMINDER_SENDER')
+    if not spec:
+        return LogSender()
+    module_name, _, class_name = spec.partition(':')
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def init_reminders(database):
+    """ایجاد جدول صف یادآوری‌ها در صورت عدم وجود"""
+    conn = database.get_connection()
+    try:
+        cur = conn.cursor()
+        # اطلاعات عضو و کتاب هنگام صف‌شدن کپی می‌شود تا worker به جداول اصلی سر نزند
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS reminder_jobs (
+                id BIGSERIAL PRIMARY KEY,
+                borrowing_id INTEGER NOT NULL,
+                remind_on DATE NOT NULL DEFAULT CURRENT_DATE,
+                member_id INTEGER NOT NULL,
+                full_name VARCHAR(200) NOT NULL,
+                email VARCHAR(120),
+                phone VARCHAR(20),
+                title VARCHAR(200) NOT NULL,
+                due_date TIMESTAMP NOT NULL,
+                status VARCHAR(10) NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                locked_at TIMESTAMP,
+                sent_at TIMESTAMP,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (borrowing_id, remind_on)
+            )
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_reminder_jobs_due
+            ON reminder_jobs (next_attempt_at)
+            WHERE status = 'pending'
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_reminder_jobs_sending
+            ON reminder_jobs (locked_at)
+            WHERE status = 'sending'
+        """)
+        conn.commit()
+        cur.close()
+    except Error as e:
+        print(f"Error initializing reminders: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def enqueue_overdue_reminders(database, chunk_size=500, interval_days=3):
+    """افزودن امانت‌های معوقه به صف یادآوری
+
+    امانت‌ها با cursor سمت سرور دسته به دسته خوانده و هر دسته در تراکنش
+    جداگانه درج می‌شود. امانتی که در interval_days روز گذشته یادآوری داشته
+    دوباره صف نمی‌شود و کلید یکتای (borrowing_id, remind_on) از درج تکراری
+    در اجرای هم‌زمان جلوگیری می‌کند.
+    خروجی: تعداد یادآوری‌های جدید
+    """
+    enqueued = 0
+    stream = None
+    conn = database.get_connection()
+    try:
+        # WITH HOLD تا cursor پس از commit هر دسته باز بماند
+        stream = conn.cursor(name='overdue_reminders', withhold=True)
+        stream.itersize = chunk_size
+        stream.execute("""
+            SELECT b.id, m.id, m.full_name, m.email, m.phone, books.title, b.due_date
+            FROM borrowings b
+            JOIN members m ON b.member_id = m.id
+            JOIN books ON b.book_id = books.id
+            WHERE b.is_returned = FALSE AND b.due_date < CURRENT_DATE
+              AND m.is_active = TRUE
+              AND (m.email IS NOT NULL OR m.phone IS NOT NULL)
+              AND NOT EXISTS (
+                  SELECT 1 FROM reminder_jobs r
+                  WHERE r.borrowing_id = b.id
+                    AND r.remind_on > CURRENT_DATE - %s
+              )
+            ORDER BY b.due_date
+        """, (interval_days,))
+
+        cur = conn.cursor()
+        while True:
+            rows = stream.fetchmany(chunk_size)
+            if not rows:
+                break
+            execute_values(cur, """
+                INSERT INTO reminder_jobs (borrowing_id, member_id, full_name, email,
+                                           phone, title, due_date)
+                VALUES %s
+                ON CONFLICT (borrowing_id, remind_on) DO NOTHING
+            """, rows, page_size=chunk_size)
+            enqueued += cur.rowcount
+            conn.commit()
+
+        cur.close()
+        stream.close()
+        conn.commit()
+        return enqueued
+    except Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        # cursor WITH HOLD با rollback بسته نمی‌شود و نباید روی اتصال pool بماند
+        if stream is not None and not stream.closed:
+            try:
+                stream.close()
+                conn.commit()
+            except Error:
+                conn.rollback()
+        conn.close()
+
+
+def claim_reminders(database, batch_size=100, lock_timeout=600):
+    """برداشتن یک دسته یادآوری آماده ارسال
+
+    SKIP LOCKED اجازه می‌دهد چند worker هم‌زمان دسته‌های جدا بردارند.
+    یادآوری‌هایی که بیش از lock_timeout ثانیه در وضعیت sending مانده‌اند
+    (worker از کار افتاده) دوباره قابل برداشت هستند.
+    """
+    conn = database.get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE reminder_jobs
+            SET status = 'sending', locked_at = CURRENT_TIMESTAMP, attempts = attempts + 1
+            WHERE id IN (
+                SELECT id FROM reminder_jobs
+                WHERE (status = 'pending' AND next_attempt_at <= CURRENT_TIMESTAMP)
+                   OR (status = 'sending'
+                       AND locked_at < CURRENT_TIMESTAMP - make_interval(secs => %s))
+                ORDER BY id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, borrowing_id, member_id, full_name, email, phone,
+                      title, due_date, attempts
+        """, (lock_timeout, batch_size))
+        columns = [column[0] for column in cur.description]
+        jobs = [dict(zip(columns, row)) for row in cur.fetchall()]
+        conn.commit()
+        cur.close()
+        return jobs
+    except Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def complete_reminders(database, jobs, failures, max_attempts=5, backoff_seconds=60):
+    """ثبت نتیجه ارسال یک دسته
+
+    موارد ناموفق با تأخیر نمایی (backoff_seconds * 2^(attempts-1)) دوباره صف
+    می‌شوند و پس از max_attempts تلاش به وضعیت failed می‌روند.
+    """
+    sent = [job['id'] for job in jobs if job['id'] not in failures]
+    retry = [(job['id'], failures[job['id']], job['attempts'])
+             for job in jobs if job['id'] in failures]
+
+    conn = database.get_connection()
+    try:
+        cur = conn.cursor()
+        if sent:
+            cur.execute("""
+                UPDATE reminder_jobs
+                SET status = 'sent', sent_at = CURRENT_TIMESTAMP, locked_at = NULL, last_error = NULL
+                WHERE id = ANY(%s)
+            """, (sent,))
+        if retry:
+            execute_values(cur, """
+                UPDATE reminder_jobs AS r
+                SET status = CASE WHEN v.attempts >= %s THEN 'failed' ELSE 'pending' END,
+                    next_attempt_at = CURRENT_TIMESTAMP
+                        + make_interval(secs => %s * power(2, v.attempts - 1)),
+                    locked_at = NULL,
+                    last_error = v.error
+                FROM (VALUES %%s) AS v (id, error, attempts)
+                WHERE r.id = v.id
+            """ % (int(max_attempts), int(backoff_seconds)), retry)
+        conn.commit()
+        cur.close()
+    except Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def process_reminder_batch(database, sender, batch_size=100):
+    """برداشتن، ارسال و ثبت نتیجه یک دسته؛ خروجی: (تعداد ارسال‌شده، تعداد ناموفق)"""
+    jobs = claim_reminders(database, batch_size)
+    if not jobs:
+        return 0, 0
+    try:
+        failures = sender.send_batch(jobs) or {}
+    except Exception as e:
+        # خطای کل دسته: همه موارد با backoff دوباره تلاش می‌شوند
+        print(f"Error sending reminders: {e}")
+        failures = {job['id']: str(e) for job in jobs}
+    complete_reminders(database, jobs, failures)
+    return len(jobs) - len(failures), len(failures)
+
+
+def run_reminder_workers(databases, sender, workers=4, batch_size=100,
+                         poll_interval=30, once=False):
+    """اجرای چند worker موازی روی صف یادآوری همه shardها
+
+    هر worker دسته‌ها را تا خالی شدن صف پردازش می‌کند و سپس poll_interval
+    ثانیه منتظر می‌ماند. خطای یک دسته لاگ می‌شود و worker پس از poll_interval
+    ثانیه ادامه می‌دهد. با once=True پس از خالی شدن صف برمی‌گردد و خطاها به
+    فراخواننده می‌رسند.
+    خروجی: (تعداد ارسال‌شده، تعداد ناموفق)
+    """
+    totals = [0, 0]
+    totals_lock = threading.Lock()
+
+    def worker():
+        while True:
+            idle = True
+            for database in databases:
+                try:
+                    sent, failed = process_reminder_batch(database, sender, batch_size)
+                except Exception as e:
+                    if once:
+                        raise
+                    # خطای گذرای پایگاه داده نباید worker را متوقف کند
+                    print(f"Error processing reminder batch: {e}")
+                    time.sleep(poll_interval)
+                    continue
+                if sent or failed:
+                    idle = False
+                    with totals_lock:
+                        totals[0] += sent
+                        totals[1] += failed
+            if idle:
+                if once:
+                    return
+                time.sleep(poll_interval)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(worker) for _ in range(workers)]:
+            future.result()
+    return tuple(totals)
+
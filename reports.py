@@ -0,0 +1,242 @@
+from psycopg2 import Error
+
+# گزارش‌های قابل ارائه: نام -> (عنوان، پرس‌وجوی خواندن از جدول تجمیعی)
+REPORTS = {
+    'top_books': ('پرامانت‌ترین کتاب‌ها', """
+        SELECT book_id, title, author, loan_count, last_borrowed
+        FROM report_book_loans
+        WHERE branch_id = %s
+        ORDER BY loan_count DESC, book_id
+        LIMIT %s
+    """),
+    'top_members': ('فعال‌ترین اعضا', """
+        SELECT member_id, full_name, loan_count, last_borrowed
+        FROM report_member_loans
+        WHERE branch_id = %s
+        ORDER BY loan_count DESC, member_id
+        LIMIT %s
+    """),
+    'monthly_circulation': ('گردش ماهانه امانت', """
+        SELECT month, loan_count
+        FROM report_monthly_circulation
+        WHERE branch_id = %s
+        ORDER BY month DESC
+        LIMIT %s
+    """),
+    'loans_by_year': ('امانت بر اساس سال انتشار', """
+        SELECT publication_year, loan_count
+        FROM report_year_loans
+        WHERE branch_id = %s
+        ORDER BY publication_year DESC NULLS LAST
+        LIMIT %s
+    """),
+}
+
+# ستون‌های خروجی JSON هر گزارش
+REPORT_COLUMNS = {
+    'top_books': ('book_id', 'title', 'author', 'loan_count', 'last_borrowed'),
+    'top_members': ('member_id', 'full_name', 'loan_count', 'last_borrowed'),
+    'monthly_circulation': ('month', 'loan_count'),
+    'loans_by_year': ('publication_year', 'loan_count'),
+}
+
+ROLLUP_TABLES = ('report_book_loans', 'report_member_loans',
+                 'report_monthly_circulation', 'report_year_loans')
+
+
+def init_reports(database):
+    """ایجاد جداول تجمیعی گزارش‌ها در صورت عدم وجود
+
+    همه جداول تجمیعی ستون branch_id دارند تا شعبه‌هایی که یک shard مشترک
+    دارند فقط آمار خود را ببینند.
+    """
+    conn = database.get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS report_book_loans (
+                book_id INTEGER PRIMARY KEY REFERENCES books(id) ON DELETE CASCADE,
+                branch_id INTEGER NOT NULL,
+                title VARCHAR(200) NOT NULL,
+                author VARCHAR(200) NOT NULL,
+                loan_count BIGINT NOT NULL DEFAULT 0,
+                last_borrowed TIMESTAMP
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS report_member_loans (
+                member_id INTEGER PRIMARY KEY REFERENCES members(id) ON DELETE CASCADE,
+                branch_id INTEGER NOT NULL,
+                full_name VARCHAR(200) NOT NULL,
+                loan_count BIGINT NOT NULL DEFAULT 0,
+                last_borrowed TIMESTAMP
+            )
+        """)
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS report_monthly_circulation (
+                branch_id INTEGER NOT NULL,
+                month DATE NOT NULL,
+                loan_count BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (branch_id, month)
+            )
+        """)
+        # سال انتشار نامعلوم با 0 ذخیره می‌شود تا کلید اصلی NULL نباشد
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS report_year_loans (
+                branch_id INTEGER NOT NULL,
+                publication_year INTEGER NOT NULL,
+                loan_count BIGINT NOT NULL DEFAULT 0,
+                PRIMARY KEY (branch_id, publication_year)
+            )
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_report_book_loans_count
+            ON report_book_loans (branch_id, loan_count DESC)
+        """)
+        cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_report_member_loans_count
+            ON report_member_loans (branch_id, loan_count DESC)
+        """)
+        # نقطه پیشرفت به‌روزرسانی افزایشی
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS report_state (
+                name VARCHAR(40) PRIMARY KEY,
+                last_borrowing_id BIGINT NOT NULL DEFAULT 0,
+                refreshed_at TIMESTAMP
+            )
+        """)
+        cur.execute("""
+            INSERT INTO report_state (name) VALUES ('circulation')
+            ON CONFLICT (name) DO NOTHING
+        """)
+        conn.commit()
+        cur.close()
+    except Error as e:
+        print(f"Error initializing reports: {e}")
+        conn.rollback()
+    finally:
+        conn.close()
+
+
+def refresh_reports(database, full=False, settle_seconds=60):
+    """به‌روزرسانی افزایشی جداول تجمیعی از امانت‌های جدید
+
+    فقط امانت‌هایی با id بزرگ‌تر از آخرین نقطه پیشرفت خوانده می‌شوند.
+    امانت‌های چند ثانیه اخیر (settle_seconds) به اجرای بعد موکول می‌شوند تا
+    تراکنش‌هایی که هنوز commit نشده‌اند جا نمانند. قفل ردیف report_state
+    اجرای هم‌زمان دو refresh را سریالی می‌کند؛ خواندن گزارش‌ها مسدود نمی‌شود.
+    full=True جداول را از ابتدا بازسازی می‌کند.
+    خروجی: تعداد امانت‌های پردازش‌شده
+    """
+    conn = database.get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT last_borrowing_id FROM report_state
+            WHERE name = 'circulation'
+            FOR UPDATE
+        """)
+        last_id = cur.fetchone()[0]
+
+        if full:
+            cur.execute("TRUNCATE " + ", ".join(ROLLUP_TABLES))
+            last_id = 0
+
+        cur.execute("""
+            SELECT COALESCE(MAX(id), %s) FROM borrowing_history
+            WHERE id > %s AND borrow_date < NOW() - make_interval(secs => %s)
+        """, (last_id, last_id, settle_seconds))
+        upper_id = cur.fetchone()[0]
+
+        processed = 0
+        if upper_id > last_id:
+            cur.execute("""
+                CREATE TEMP TABLE report_delta ON COMMIT DROP AS
+                SELECT h.id, h.book_id, h.member_id, h.borrow_date, h.branch_id,
+                       books.title, books.author, books.publication_year,
+                       members.full_name
+                FROM borrowing_history h
+                JOIN books ON h.book_id = books.id
+                JOIN members ON h.member_id = members.id
+                WHERE h.id > %s AND h.id <= %s
+            """, (last_id, upper_id))
+            processed = cur.rowcount
+
+            cur.execute("""
+                INSERT INTO report_book_loans AS r (book_id, branch_id, title, author, loan_count, last_borrowed)
+                SELECT book_id, MAX(branch_id), MAX(title), MAX(author), COUNT(*), MAX(borrow_date)
+                FROM report_delta
+                GROUP BY book_id
+                ON CONFLICT (book_id) DO UPDATE SET
+                    title = EXCLUDED.title,
+                    author = EXCLUDED.author,
+                    loan_count = r.loan_count + EXCLUDED.loan_count,
+                    last_borrowed = GREATEST(r.last_borrowed, EXCLUDED.last_borrowed)
+            """)
+            cur.execute("""
+                INSERT INTO report_member_loans AS r (member_id, branch_id, full_name, loan_count, last_borrowed)
+                SELECT member_id, MAX(branch_id), MAX(full_name), COUNT(*), MAX(borrow_date)
+                FROM report_delta
+                GROUP BY member_id
+                ON CONFLICT (member_id) DO UPDATE SET
+                    full_name = EXCLUDED.full_name,
+                    loan_count = r.loan_count + EXCLUDED.loan_count,
+                    last_borrowed = GREATEST(r.last_borrowed, EXCLUDED.last_borrowed)
+            """)
+            cur.execute("""
+                INSERT INTO report_monthly_circulation AS r (branch_id, month, loan_count)
+                SELECT branch_id, date_trunc('month', borrow_date)::date, COUNT(*)
+                FROM report_delta
+                GROUP BY 1, 2
+                ON CONFLICT (branch_id, month) DO UPDATE SET
+                    loan_count = r.loan_count + EXCLUDED.loan_count
+            """)
+            cur.execute("""
+                INSERT INTO report_year_loans AS r (branch_id, publication_year, loan_count)
+                SELECT branch_id, COALESCE(publication_year, 0), COUNT(*)
+                FROM report_delta
+                GROUP BY 1, 2
+                ON CONFLICT (branch_id, publication_year) DO UPDATE SET
+                    loan_count = r.loan_count + EXCLUDED.loan_count
+            """)
+
+        cur.execute("""
+            UPDATE report_state
+            SET last_borrowing_id = %s, refreshed_at = CURRENT_TIMESTAMP
+            WHERE name = 'circulation'
+        """, (upper_id,))
+        conn.commit()
+        cur.close()
+        return processed
+    except Error as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def get_report(database, name, limit=20):
+    """خواندن گزارش شعبه database فقط از جدول تجمیعی آن"""
+    title, query = REPORTS[name]
+    conn = database.get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(query, (database.branch_id, limit))
+        rows = cur.fetchall()
+        cur.close()
+        return rows
+    finally:
+        conn.close()
+
+
+def get_refreshed_at(database):
+    """زمان آخرین به‌روزرسانی گزارش‌ها"""
+    conn = database.get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT refreshed_at FROM report_state WHERE name = 'circulation'")
+        row = cur.fetchone()
+        cur.close()
+        return row[0] if row else None
+    finally:
+        conn.close()
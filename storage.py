@@ -0,0 +1,151 @@
+import os
+import hashlib
+import binascii
+from abc import ABC, abstractmethod
+
+
+class LibraryStorage(ABC):
+    """رابط مشترک backendهای ذخیره‌سازی کتابخانه
+
+    هر backend داده‌های یک شعبه را نگه می‌دارد و ردیف‌ها را با مدل‌های
+    models.py (Book، Member، Loan، Hold، Admin) برمی‌گرداند تا routeها و
+    templateها به نوع backend وابسته نباشند.
+    """
+
+    # نام backend؛ قابلیت‌های مخصوص PostgreSQL فقط برای 'postgres' در دسترس‌اند
+    backend = None
+
+    # راه‌اندازی
+    @abstractmethod
+    def init_db(self):
+        """ایجاد ساختار ذخیره‌سازی و ادمین پیش‌فرض"""
+
+    # رمز عبور
+    def _hash_password(self, password):
+        """هش کردن رمز عبور"""
+        salt = hashlib.sha256(os.urandom(60)).hexdigest().encode('ascii')
+        pwdhash = hashlib.pbkdf2_hmac('sha512', password.encode('utf-8'),
+                                     salt, 100000)
+        pwdhash = binascii.hexlify(pwdhash)
+        return (salt + pwdhash).decode('ascii')
+
+    def verify_password(self, stored_password, provided_password):
+        """بررسی رمز عبور"""
+        salt = stored_password[:64]
+        stored_password = stored_password[64:]
+        pwdhash = hashlib.pbkdf2_hmac('sha512',
+                                      provided_password.encode('utf-8'),
+                                      salt.encode('ascii'),
+                                      100000)
+        pwdhash = binascii.hexlify(pwdhash).decode('ascii')
+        return pwdhash == stored_password
+
+    # ادمین‌ها
+    @abstractmethod
+    def authenticate_admin(self, username, password):
+        """احراز هویت ادمین؛ خروجی: Admin یا None"""
+
+    @abstractmethod
+    def get_admin_by_id(self, admin_id):
+        """دریافت ادمین؛ خروجی: Admin یا None"""
+
+    @abstractmethod
+    def change_admin_password(self, admin_id, current_password, new_password):
+        """تغییر رمز عبور؛ False اگر رمز فعلی اشتباه باشد"""
+
+    # اعضا
+    @abstractmethod
+    def get_all_members(self):
+        """اعضای فعال به صورت Member با همه فیلدها"""
+
+    @abstractmethod
+    def get_member_by_id(self, member_id):
+        """یک Member با همه فیلدها یا None"""
+
+    @abstractmethod
+    def add_member(self, full_name, phone, email, address):
+        """افزودن عضو؛ خروجی: id"""
+
+    @abstractmethod
+    def deactivate_member(self, member_id):
+        """غیرفعال کردن عضو"""
+
+    @abstractmethod
+    def get_active_members(self):
+        """اعضای فعال برای فرم‌ها: Member با id، full_name و phone"""
+
+    # کتاب‌ها
+    @abstractmethod
+    def get_all_books(self):
+        """همه کتاب‌های شعبه به صورت Book با همه فیلدها به جز branch_id"""
+
+    @abstractmethod
+    def get_book_by_id(self, book_id):
+        """یک Book بدون created_at و branch_id، یا None"""
+
+    @abstractmethod
+    def add_book(self, title, author, isbn, publication_year, total_copies):
+        """افزودن کتاب؛ خروجی: id"""
+
+    @abstractmethod
+    def delete_book(self, book_id):
+        """حذف کتاب به همراه امانت‌ها و رزروهای آن"""
+
+    @abstractmethod
+    def has_open_borrowings(self, book_id):
+        """آیا کتاب امانت فعال دارد"""
+
+    @abstractmethod
+    def search_books(self, search_type, keyword):
+        """جستجو در عنوان یا نویسنده: Book با id، title، author، available_copies و branch_id"""
+
+    @abstractmethod
+    def get_available_books(self):
+        """کتاب‌های قابل امانت: Book با id، title و author"""
+
+    @abstractmethod
+    def get_unavailable_books(self):
+        """کتاب‌های قابل رزرو: Book با id، title و author"""
+
+    # امانت‌ها
+    @abstractmethod
+    def borrow_book(self, book_id, member_id, days):
+        """امانت دادن کتاب؛ خروجی: موعد بازگشت"""
+
+    @abstractmethod
+    def return_book(self, book_id):
+        """بازگرداندن کتاب؛ خروجی: (hold_id, member_id) یا None"""
+
+    @abstractmethod
+    def get_borrowed_books(self):
+        """امانت‌های فعال به صورت Loan (بدون return_date) به ترتیب موعد بازگشت"""
+
+    @abstractmethod
+    def get_member_history(self, member_id, before=None, limit=20):
+        """تاریخچه امانت عضو؛ خروجی: (لیست Loan، next_cursor)"""
+
+    @abstractmethod
+    def get_book_history(self, book_id, before=None, limit=20):
+        """تاریخچه امانت کتاب؛ خروجی: (لیست Loan، next_cursor)"""
+
+    # رزروها
+    @abstractmethod
+    def place_hold(self, book_id, member_id):
+        """ثبت رزرو؛ خروجی: id"""
+
+    @abstractmethod
+    def cancel_hold(self, hold_id):
+        """لغو رزرو"""
+
+    @abstractmethod
+    def get_active_holds(self):
+        """رزروهای در صف و آماده تحویل به صورت Hold"""
+
+    # رویدادها و آمار
+    @abstractmethod
+    def get_recent_events(self, limit=10):
+        """آخرین رویدادها: (id, event_type, description, created_at)"""
+
+    @abstractmethod
+    def get_stats(self):
+        """آمار کلی شعبه؛ overdue_list شامل Loan با title، full_name و due_date است"""
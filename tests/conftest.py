@@ -0,0 +1,56 @@
+import os
+import sys
+
+import pytest
+
+# ماژول‌های برنامه در ریشه مخزن هستند
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# آزمون‌های route روی backend درون‌حافظه‌ای و بدون PostgreSQL اجرا می‌شوند
+os.environ['STORAGE_BACKEND'] = 'memory'
+os.environ['SECRET_KEY'] = 'test-secret-key'
+os.environ['ADMIN_USERNAME'] = 'admin'
+os.environ['ADMIN_PASSWORD'] = 'admin123'
+os.environ.pop('BRANCH_DATABASE_URLS', None)
+
+
+@pytest.fixture
+def database_url():
+    """پایگاه داده PostgreSQL آزمایشی؛ بدون TEST_DATABASE_URL آزمون رد می‌شود"""
+    url = os.environ.get('TEST_DATABASE_URL')
+    if not url:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    return url
+
+
+@pytest.fixture
+def storage():
+    """یک MemoryStorage تازه به عنوان تنها شعبه برای هر آزمون"""
+    from database import db
+    from memory_storage import MemoryStorage
+
+    branches, default_branch = db.branches, db.default_branch
+    db.branches = {1: MemoryStorage(1)}
+    db.default_branch = 1
+    db.init_db()
+    yield db.branches[1]
+    db.branches, db.default_branch = branches, default_branch
+
+
+@pytest.fixture
+def client(storage):
+    """کلاینت آزمون Flask که با ادمین پیش‌فرض وارد شده است"""
+    from app import app
+
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        response = client.post('/login', data={'username': 'admin', 'password': 'admin123'})
+        assert response.status_code == 302
+        yield client
+
+
+def flashes(client):
+    """پیام‌های flash ثبت‌شده در session و پاک کردن آن‌ها"""
+    with client.session_transaction() as session:
+        return [message for category, message in session.pop('_flashes', [])]
@@ -0,0 +1,19 @@
+"""برنامه WSGI کوچک برای آزمون هم‌زمانی worker؛ هر درخواست یک پرس‌وجوی کند دارد"""
+import os
+
+from database import Database
+
+database = Database(os.environ['DATABASE_URL'])
+QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', 0.3))
+
+
+def app(environ, start_response):
+    conn = database.get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT pg_sleep(%s)", (QUERY_SECONDS,))
+        cur.close()
+    finally:
+        conn.close()
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'ok']
@@ -0,0 +1,37 @@
+from cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    cache = LRUCache(max_size=2, ttl=60)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.stats()['evictions'] == 1
+
+
+def test_invalidate_tag_removes_only_tagged_entries():
+    cache = LRUCache(max_size=10, ttl=60)
+    cache.put(('title', 'py'), (1, 2), tags=[1, 2])
+    cache.put(('title', 'go'), (3,), tags=[3])
+    cache.invalidate_tag(2)
+    assert cache.get(('title', 'py')) is None
+    assert cache.get(('title', 'go')) == (3,)
+
+
+def test_put_after_invalidation_is_dropped():
+    cache = LRUCache(max_size=10, ttl=60)
+    generation = cache.generation
+    # نوشتنی پس از خواندن نتیجه و پیش از ذخیره آن
+    cache.invalidate_tag(1)
+    cache.put('key', 'stale', generation=generation)
+    assert cache.get('key') is None
+
+
+def test_entries_expire_after_ttl():
+    cache = LRUCache(max_size=10, ttl=0)
+    cache.put('key', 'value')
+    assert cache.get('key') is None
+    assert cache.stats()['expirations'] == 1
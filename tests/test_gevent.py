@@ -0,0 +1,110 @@
+import os
+import select
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+gevent = pytest.importorskip('gevent')
+from psycopg2 import extensions
+
+from conftest import ROOT
+from green import gevent_wait_callback
+
+CONCURRENCY = 10
+QUERY_SECONDS = 0.3
+
+
+class SlowConnection:
+    """اتصال ساختگی psycopg2 که پاسخش پس از delay ثانیه روی socket می‌رسد"""
+
+    def __init__(self, delay):
+        self.reader, self.writer = socket.socketpair()
+        gevent.spawn_later(delay, self.writer.send, b'x')
+
+    def fileno(self):
+        return self.reader.fileno()
+
+    def poll(self):
+        readable, _, _ = select.select([self.reader], [], [], 0)
+        return extensions.POLL_OK if readable else extensions.POLL_READ
+
+    def close(self):
+        self.reader.close()
+        self.writer.close()
+
+
+def test_wait_callback_lets_other_greenlets_run():
+    connections = [SlowConnection(QUERY_SECONDS) for _ in range(CONCURRENCY)]
+    started = time.monotonic()
+    gevent.joinall([gevent.spawn(gevent_wait_callback, conn) for conn in connections], raise_error=True)
+    elapsed = time.monotonic() - started
+    for conn in connections:
+        conn.close()
+    # انتظار پشت سر هم CONCURRENCY × QUERY_SECONDS طول می‌کشید
+    assert elapsed < QUERY_SECONDS * 3
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, proc, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn exited with code {proc.returncode}")
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise TimeoutError("gunicorn did not start")
+
+
+def _serve_concurrently(worker_class, database_url):
+    """اجرای یک worker و ارسال CONCURRENCY درخواست هم‌زمان؛ خروجی: مدت کل (ثانیه)"""
+    pytest.importorskip('gunicorn')
+    port = _free_port()
+    env = dict(os.environ,
+               DATABASE_URL=database_url,
+               GUNICORN_BIND=f'127.0.0.1:{port}',
+               GUNICORN_WORKERS='1',
+               GUNICORN_WORKER_CLASS=worker_class,
+               SLOW_QUERY_SECONDS=str(QUERY_SECONDS))
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+         '--pythonpath', 'tests', 'slow_app:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        _wait_for_port(port, proc)
+        url = f'http://127.0.0.1:{port}/'
+        urllib.request.urlopen(url, timeout=30).read()
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as executor:
+            bodies = list(executor.map(lambda _: urllib.request.urlopen(url, timeout=30).read(),
+                                       range(CONCURRENCY)))
+        elapsed = time.monotonic() - started
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+    assert bodies == [b'ok'] * CONCURRENCY
+    return elapsed
+
+
+def test_gevent_worker_serves_requests_concurrently(database_url):
+    elapsed = _serve_concurrently('gevent', database_url)
+    assert elapsed < CONCURRENCY * QUERY_SECONDS / 3
+
+
+def test_sync_worker_serializes_requests(database_url):
+    elapsed = _serve_concurrently('sync', database_url)
+    assert elapsed >= CONCURRENCY * QUERY_SECONDS * 0.9
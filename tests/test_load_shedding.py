@@ -0,0 +1,56 @@
+import socket
+import threading
+
+from database import PooledConnection
+from load_shedding import _watch_disconnect
+
+
+class FakePool:
+    def __init__(self):
+        self.returned = []
+
+    def putconn(self, conn):
+        self.returned.append(conn)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.cancelled = 0
+
+    def cancel(self):
+        self.cancelled += 1
+
+
+def test_returned_connection_is_not_cancelled():
+    active = []
+    conn = FakeConnection()
+    wrapper = PooledConnection(FakePool(), conn, active)
+    assert active == [wrapper]
+
+    wrapper.close()
+    assert active == []
+    # اتصال به pool برگشته و ممکن است در اختیار درخواست دیگری باشد
+    wrapper.cancel()
+    assert conn.cancelled == 0
+
+
+def test_disconnect_cancels_only_checked_out_connections():
+    connection_pool = FakePool()
+    active = []
+    running, returned = FakeConnection(), FakeConnection()
+    PooledConnection(connection_pool, running, active)
+    stale = PooledConnection(connection_pool, returned, active)
+    # close هم‌زمان با پیمایش لیست توسط watcher
+    snapshot = list(active)
+    stale.close()
+
+    server, client = socket.socketpair()
+    try:
+        client.close()
+        done = threading.Event()
+        _watch_disconnect(server, snapshot, done)
+    finally:
+        server.close()
+
+    assert running.cancelled == 1
+    assert returned.cancelled == 0
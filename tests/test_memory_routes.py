@@ -0,0 +1,146 @@
+import re
+from html import unescape
+
+from conftest import flashes
+
+
+def add_book(client, storage, title, copies=1):
+    client.post('/books/add', data={'title': title, 'author': 'نویسنده', 'total_copies': copies})
+    flashes(client)
+    return max(book.id for book in storage.get_all_books() if book.title == title)
+
+
+def add_member(client, storage, name):
+    client.post('/members/add', data={'full_name': name, 'phone': '0912', 'email': '', 'address': ''})
+    flashes(client)
+    return max(member.id for member in storage.get_all_members() if member.full_name == name)
+
+
+def borrow(client, book_id, member_id):
+    response = client.post('/borrow', data={'book_id': book_id, 'member_id': member_id, 'days': 14})
+    return flashes(client), response.get_data(as_text=True)
+
+
+def test_login_required(storage):
+    from app import app
+
+    with app.test_client() as anonymous:
+        assert anonymous.get('/dashboard').status_code == 302
+
+
+def test_pages_render(client, storage):
+    book_id = add_book(client, storage, 'کتاب نمونه')
+    member_id = add_member(client, storage, 'عضو نمونه')
+    borrow(client, book_id, member_id)
+    for path in ('/dashboard', '/books', '/members', '/borrow', '/return', '/holds', '/search',
+                 '/borrowed', f'/books/{book_id}/history', f'/members/{member_id}/history'):
+        assert client.get(path).status_code == 200, path
+
+
+def test_holds_are_served_in_order_on_return(client, storage):
+    book_id = add_book(client, storage, 'کتاب پرطرفدار')
+    first, second, third = (add_member(client, storage, name) for name in ('اول', 'دوم', 'سوم'))
+
+    borrow(client, book_id, first)
+    client.post('/holds', data={'book_id': book_id, 'member_id': second})
+    client.post('/holds', data={'book_id': book_id, 'member_id': third})
+    flashes(client)
+
+    client.post('/return', data={'book_id': book_id})
+    assert flashes(client) == [f'کتاب بازگردانده شد و برای رزرو عضو با کد {second} کنار گذاشته شد.']
+
+    # نسخه برای نفر اول صف کنار گذاشته شده و دیگران نمی‌توانند آن را امانت بگیرند
+    # در صورت خطا فرم دوباره با پیام خطا نمایش داده می‌شود
+    assert 'کتاب موجود نیست' in borrow(client, book_id, third)[1]
+    assert borrow(client, book_id, second)[0][0].startswith('کتاب با موفقیت امانت داده شد')
+    assert storage.get_book_by_id(book_id).available_copies == 0
+
+    client.post('/return', data={'book_id': book_id})
+    assert flashes(client) == [f'کتاب بازگردانده شد و برای رزرو عضو با کد {third} کنار گذاشته شد.']
+
+
+def test_cancelled_ready_hold_passes_copy_to_next(client, storage):
+    book_id = add_book(client, storage, 'کتاب کمیاب')
+    first, second, third = (add_member(client, storage, name) for name in ('اول', 'دوم', 'سوم'))
+    borrow(client, book_id, first)
+    client.post('/holds', data={'book_id': book_id, 'member_id': second})
+    client.post('/holds', data={'book_id': book_id, 'member_id': third})
+    client.post('/return', data={'book_id': book_id})
+    flashes(client)
+
+    ready = next(hold for hold in storage.get_active_holds() if hold.is_ready)
+    assert ready.member_id == second
+    client.get(f'/holds/{ready.id}/cancel')
+    assert flashes(client) == ['رزرو لغو شد.']
+
+    [hold] = storage.get_active_holds()
+    assert (hold.member_id, hold.is_ready) == (third, True)
+
+
+def test_member_history_keyset_paging(client, storage):
+    member_id = add_member(client, storage, 'کتاب‌خوان')
+    for i in range(25):
+        book_id = add_book(client, storage, f'Book {i:02}')
+        borrow(client, book_id, member_id)
+        client.post('/return', data={'book_id': book_id})
+    flashes(client)
+
+    path = f'/members/{member_id}/history'
+    pages = []
+    query = ''
+    while True:
+        html = client.get(path + query).get_data(as_text=True)
+        pages.append([int(n) for n in re.findall(r'Book (\d\d)', html)])
+        link = re.search(r'\?before=([^"]+)"', html)
+        if not link:
+            break
+        query = '?before=' + unescape(link.group(1))
+
+    assert [len(set(page)) for page in pages] == [20, 5]
+    titles = [n for page in pages for n in dict.fromkeys(page)]
+    assert titles == list(range(24, -1, -1))
+
+
+def test_delete_is_refused_while_book_is_borrowed(client, storage):
+    book_id = add_book(client, storage, 'کتاب امانتی')
+    member_id = add_member(client, storage, 'امانت‌گیر')
+    borrow(client, book_id, member_id)
+
+    client.get(f'/books/{book_id}/delete')
+    assert flashes(client) == ['این کتاب در حال حاضر امانت است و قابل حذف نیست.']
+    assert storage.get_book_by_id(book_id) is not None
+
+    client.post('/return', data={'book_id': book_id})
+    flashes(client)
+    client.get(f'/books/{book_id}/delete')
+    assert flashes(client) == ['کتاب "کتاب امانتی" با موفقیت حذف شد.']
+    assert storage.get_book_by_id(book_id) is None
+
+
+def test_search_reflects_borrow_and_return(client, storage):
+    book_id = add_book(client, storage, 'Clean Code')
+    member_id = add_member(client, storage, 'خواننده')
+
+    def copies():
+        [book] = storage.search_books('title', 'clean')
+        return book.available_copies
+
+    assert copies() == 1
+    borrow(client, book_id, member_id)
+    assert copies() == 0
+    client.post('/return', data={'book_id': book_id})
+    assert copies() == 1
+    html = client.post('/search', data={'search_type': 'title', 'keyword': 'clean'}).get_data(as_text=True)
+    assert 'Clean Code' in html
+
+
+def test_maintenance_commands_require_postgres(storage):
+    from app import app
+
+    runner = app.test_cli_runner()
+    for command in (['archive-borrowings'], ['measure-planning'], ['refresh-reports'],
+                    ['enqueue-reminders'], ['run-reminder-worker', '--once'],
+                    ['reconcile-inventory', '--dry-run']):
+        result = runner.invoke(args=command)
+        assert result.exit_code == 2, command
+        assert 'PostgreSQL' in result.output
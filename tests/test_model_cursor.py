@@ -0,0 +1,29 @@
+from typing import NamedTuple
+
+from database import Database, ModelCursor
+
+
+class Count(NamedTuple):
+    total: int
+    label: str = ''
+
+
+class Total(NamedTuple):
+    total: int
+
+
+def test_reassigned_row_model_with_same_columns(database_url):
+    conn = Database(database_url).get_connection()
+    try:
+        cur = conn.cursor(cursor_factory=ModelCursor)
+        cur.row_model = Count
+        cur.execute("SELECT 1 AS total")
+        assert cur.fetchone() == Count(1, '')
+        # همان ستون‌ها با مدل دیگر (مانند get_stats)
+        cur.row_model = Total
+        cur.execute("SELECT 2 AS total")
+        row = cur.fetchone()
+        assert type(row) is Total and row == Total(2)
+        cur.close()
+    finally:
+        conn.close()
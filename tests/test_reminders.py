@@ -0,0 +1,34 @@
+import pytest
+from psycopg2 import OperationalError
+
+import reminders
+
+
+class Stop(BaseException):
+    """پایان حلقه بی‌پایان worker در آزمون؛ except Exception آن را نمی‌گیرد"""
+
+
+def failing_batches(monkeypatch, errors):
+    """process_reminder_batch ساختگی که ابتدا errors را و سپس Stop را raise می‌کند"""
+    calls = []
+
+    def process(database, sender, batch_size):
+        calls.append(database)
+        raise errors.pop(0) if errors else Stop()
+
+    monkeypatch.setattr(reminders, 'process_reminder_batch', process)
+    return calls
+
+
+def test_worker_survives_database_errors(monkeypatch, capsys):
+    calls = failing_batches(monkeypatch, [OperationalError('connection lost')])
+    with pytest.raises(Stop):
+        reminders.run_reminder_workers(['shard'], sender=None, workers=1, poll_interval=0)
+    assert len(calls) == 2
+    assert 'connection lost' in capsys.readouterr().out
+
+
+def test_once_propagates_errors(monkeypatch):
+    failing_batches(monkeypatch, [OperationalError('connection lost')])
+    with pytest.raises(OperationalError):
+        reminders.run_reminder_workers(['shard'], sender=None, workers=1, once=True)
@@ -0,0 +1,62 @@
+import time
+import uuid
+
+import pytest
+
+from database import Database
+
+
+def wait_for(condition, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+@pytest.fixture
+def databases(database_url):
+    """دو نمونه Database با cache جداگانه، مانند دو worker روی یک shard"""
+    first, second = Database(database_url), Database(database_url)
+    first.init_db()
+    assert wait_for(first._search_cache_ready) and wait_for(second._search_cache_ready)
+    return first, second
+
+
+def titles(database, keyword):
+    return sorted(book.title for book in database.search_books('title', keyword))
+
+
+def test_changes_in_other_process_invalidate_cache(databases):
+    reader, writer = databases
+    marker = uuid.uuid4().hex[:8]
+    book_id = writer.add_book(f'Cache {marker} one', 'Author', None, None, 1)
+    member_id = writer.add_member('Cache Reader', '0912', None, None)
+
+    [book] = reader.search_books('title', marker)
+    assert book.available_copies == 1
+    hits = reader.search_cache.hits
+    reader.search_books('title', marker)
+    assert reader.search_cache.hits == hits + 1
+
+    writer.borrow_book(book_id, member_id, 14)
+    assert wait_for(lambda: reader.search_books('title', marker)[0].available_copies == 0)
+
+    writer.add_book(f'Cache {marker} two', 'Author', None, None, 1)
+    assert wait_for(lambda: len(reader.search_books('title', marker)) == 2)
+
+
+def test_like_wildcards_match_literally(databases):
+    database, _ = databases
+    marker = uuid.uuid4().hex[:8]
+    database.add_book(f'{marker} 100% Python', 'Author', None, None, 1)
+    database.add_book(f'{marker} 1000 Python', 'Author', None, None, 1)
+    database.add_book(f'{marker} snake_case', 'Author', None, None, 1)
+    database.add_book(f'{marker} snakeXcase', 'Author', None, None, 1)
+
+    assert titles(database, f'{marker} 100%') == [f'{marker} 100% Python']
+    assert titles(database, f'{marker} snake_') == [f'{marker} snake_case']
+    # کتاب جدید فقط جستجوهایی را باطل می‌کند که واقعاً در نتیجه آن‌ها قرار می‌گیرد
+    database.add_book(f'{marker} 100%% Go', 'Author', None, None, 1)
+    assert titles(database, f'{marker} 100%') == [f'{marker} 100% Python', f'{marker} 100%% Go']